@@ -0,0 +1,222 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from typing import Callable, Optional, Tuple
+
+import aiohttp
+from fake_useragent import UserAgent
+
+import page_fetcher
+from config import ASYNC_CONFIG, HTTP_POOL_CONFIG, WORKER_POOLS
+from job import AgingBuckets, FetchJob, StopJob
+from rate_limiter import rate_scheduler
+from response_cache import response_cache
+from user_agent_tracking import choose_user_agents, ua_registry
+from worker_pools import pool_for
+from backpressure import backpressure
+from job_store import job_store
+from run_deadline import run_deadline
+from fetch_policy import (circuit_breaker, classify_response, parse_retry_after, record_fetch_outcome,
+                          GIVE_UP_OUTCOMES, USER_AGENT_FAILURES, OK, TIMEOUT, CONNECTION_ERROR, DEADLINE)
+
+
+class AgingAsyncQueue(asyncio.Queue):
+    """
+    asyncio queue with the same aging priority order as PrioritizedJobQueue.
+    """
+    def _init(self, maxsize):
+        self._queue = AgingBuckets()
+
+    def _put(self, item):
+        self._queue.put(item)
+
+    def _get(self):
+        return self._queue.get()
+
+
+class AsyncJobQueue:
+    """
+    Priority job queue for the asyncio engine. Exposes the same put_job interface as
+    PrioritizedJobQueue so existing jobs and the Dispatcher can enqueue into it, from the
+    event loop or from the blocking-job threads.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self.queue: asyncio.Queue = AgingAsyncQueue()
+        self.counter = count()
+        self.lock = threading.Lock()
+
+    def put_job(self, job, priority: int):
+        with self.lock:
+            item = (priority, next(self.counter), job)
+        if threading.get_ident() == self.loop_thread_id:
+            self.queue.put_nowait(item)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def put(self, job):
+        self.put_job(job, 0)
+
+
+class AsyncFetcher:
+    """
+    Non-blocking counterpart of page_fetcher.fetch_html_with_fallback. Known and generated user agents
+    are tried over a shared aiohttp session; the Selenium fallback still runs on a thread.
+    """
+    def __init__(self, session: aiohttp.ClientSession, concurrency: int, executor: ThreadPoolExecutor):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = executor
+        self.timeout = aiohttp.ClientTimeout(total=HTTP_POOL_CONFIG["timeout"])
+
+    async def fetch_html(self, url: str, max_attempts: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (html, outcome). On failure html is None and outcome is the last request's classification.
+        """
+        loop = asyncio.get_running_loop()
+        page_type = page_fetcher.page_type_for_url(url)
+        cached_html = await loop.run_in_executor(self.executor, response_cache.get, url, page_type)
+        if cached_html is not None:
+            return cached_html, OK
+        if response_cache.replay:
+            return None, None
+
+        tried_user_agents = set()
+        outcome = None
+        for ua in choose_user_agents(max_attempts):
+            tried_user_agents.add(ua)
+            html, outcome = await self.try_agent(url, ua)
+            if html is not None or outcome in GIVE_UP_OUTCOMES:
+                return html, outcome
+
+        ua_generator = await loop.run_in_executor(self.executor, UserAgent)
+        for _ in range(max_attempts):
+            ua = ua_generator.random
+            if ua in tried_user_agents or ua_registry.is_failed(ua):
+                continue
+            tried_user_agents.add(ua)
+            html, outcome = await self.try_agent(url, ua)
+            if html is not None or outcome in GIVE_UP_OUTCOMES:
+                return html, outcome
+
+        return None, outcome
+
+    async def try_agent(self, url: str, ua: str) -> Tuple[Optional[str], str]:
+        loop = asyncio.get_running_loop()
+        if not (await circuit_breaker.wait_until_closed_async(run_deadline.time_left())
+                and await rate_scheduler.acquire_async(url, run_deadline.time_left())):
+            return None, DEADLINE
+        async with self.semaphore:
+            started = loop.time()
+            try:
+                async with self.session.get(url, headers={"User-Agent": ua}, timeout=self.timeout) as res:
+                    body = await res.read()
+                    status = res.status
+                    retry_after = parse_retry_after(res.headers.get("Retry-After"))
+            except asyncio.TimeoutError:
+                record_fetch_outcome(url, ua, TIMEOUT)
+                return None, TIMEOUT
+            except aiohttp.ClientError:
+                record_fetch_outcome(url, ua, CONNECTION_ERROR)
+                return None, CONNECTION_ERROR
+            latency = loop.time() - started
+
+        page_fetcher.total_requests_made += 1
+        page_fetcher.total_bytes_downloaded += len(body)
+        html = body.decode("utf-8", errors="replace")
+        outcome = classify_response(status, html)
+        record_fetch_outcome(url, ua, outcome, latency=latency, retry_after=retry_after)
+        if outcome != OK:
+            return None, outcome
+
+        await loop.run_in_executor(self.executor, response_cache.put, url, html, page_fetcher.page_type_for_url(url))
+        return html, outcome
+
+
+class AsyncEngine:
+    """
+    Runs the job pipeline on an event loop. FetchJobs are downloaded concurrently with aiohttp, up to
+    `concurrency` requests in flight; parsing (via the parse pool), saving and every other job run on thread pools
+    sized and routed like the threaded engine's WORKER_POOLS. Selenium fallbacks use the blocking_workers pool.
+    """
+    def __init__(self, concurrency: int = ASYNC_CONFIG["concurrency"],
+                 blocking_workers: int = ASYNC_CONFIG["blocking_workers"]):
+        self.concurrency = concurrency
+        self.blocking_workers = blocking_workers
+        self.executor = ThreadPoolExecutor(max_workers=blocking_workers)
+        self.pool_executors = {name: ThreadPoolExecutor(max_workers=size)
+                               for name, size in WORKER_POOLS.items() if name != "fetch"}
+        self.job_queue: Optional[AsyncJobQueue] = None
+        self.fetcher: Optional[AsyncFetcher] = None
+
+    def run(self, seed: Callable[[AsyncJobQueue], None]) -> None:
+        """
+        Seeds the queue via `seed(job_queue)` and blocks until every job has finished.
+        """
+        try:
+            asyncio.run(self._run(seed))
+        finally:
+            self.executor.shutdown(wait=True)
+            for executor in self.pool_executors.values():
+                executor.shutdown(wait=True)
+
+    def executor_for(self, pool: str) -> ThreadPoolExecutor:
+        return self.pool_executors.get(pool, self.executor)
+
+    async def _run(self, seed: Callable[[AsyncJobQueue], None]) -> None:
+        loop = asyncio.get_running_loop()
+        self.job_queue = AsyncJobQueue(loop)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self.fetcher = AsyncFetcher(session, self.concurrency, self.executor)
+            seed(self.job_queue)
+
+            consumers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency + self.blocking_workers)]
+            await self.job_queue.queue.join()
+            for consumer in consumers:
+                consumer.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            priority, order, job = await self.job_queue.queue.get()
+            backpressure.job_dequeued(job.__class__.__name__)
+            attempt = None
+            failed = False
+            try:
+                attempt = job_store.mark_running(job)
+                if isinstance(job, StopJob):
+                    continue
+                if isinstance(job, FetchJob):
+                    await self._run_fetch_job(job)
+                else:
+                    await loop.run_in_executor(self.executor_for(pool_for(job)), job.run, self.job_queue)
+            except Exception as e:
+                failed = True
+                print(f"[Async Worker Error] {e}")
+            finally:
+                try:
+                    if attempt is not None:
+                        job_store.finish(job, attempt, failed)
+                except Exception as e:
+                    print(f"[Async Worker Error] job store: {e}")
+                self.job_queue.queue.task_done()
+
+    async def _run_fetch_job(self, job: FetchJob) -> None:
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(self.executor_for(pool_for(job)), job.ready, self.job_queue):
+            return
+        job.start()
+        url = job.build_url()
+        html, outcome = await self.fetcher.fetch_html(url, job.max_attempts)
+        if html is None and not response_cache.replay and (outcome is None or outcome in USER_AGENT_FAILURES):
+            html, _ = await loop.run_in_executor(self.executor, page_fetcher.fetch_with_selenium, url)
+
+        if html is not None:
+            # handle_html blocks on the process-pool parse, so it runs on the parse pool threads
+            await loop.run_in_executor(self.executor_for("parse"), job.handle_html, html, self.job_queue)
+        elif not job.defer(self.job_queue):
+            await loop.run_in_executor(self.executor_for("parse"), job.handle_failure, self.job_queue)
@@ -0,0 +1,83 @@
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple, Iterable
+
+from config import BACKPRESSURE_CONFIG
+from job_store import job_store
+
+
+class Backpressure:
+    """
+    Bounds the job pipeline by counting queued jobs per class against high/low watermarks.
+    A class becomes congested when its queued count reaches the high watermark and clears once it
+    drains to the low watermark. Producers whose downstream classes are congested are parked here
+    instead of running, and are put back on the queue when those classes clear, so the number of
+    jobs (and the data they hold) stays flat regardless of inventory size.
+    """
+    def __init__(self, config: Dict = BACKPRESSURE_CONFIG):
+        self.enabled = config["enabled"]
+        self.watermarks: Dict[str, Tuple[int, int]] = config["watermarks"]
+        self.queued = Counter()
+        self.congested = set()
+        self.parked: List[Tuple[object, object, Tuple[str, ...]]] = []  # (job, job_queue, downstream)
+        self.pauses = 0
+        self.lock = threading.Lock()
+
+    def job_enqueued(self, job_type: str) -> None:
+        if job_type not in self.watermarks:
+            return
+        with self.lock:
+            self.queued[job_type] += 1
+            if self.queued[job_type] >= self.watermarks[job_type][0]:
+                self.congested.add(job_type)
+
+    def job_dequeued(self, job_type: str) -> None:
+        """
+        Called by workers as they take a job. Re-enqueues parked producers whose downstream has cleared.
+        """
+        if job_type not in self.watermarks:
+            return
+        with self.lock:
+            self.queued[job_type] -= 1
+            if job_type in self.congested and self.queued[job_type] <= self.watermarks[job_type][1]:
+                self.congested.discard(job_type)
+            released = self._take_released()
+
+        from utils.job_utils import enqueue_with_priority
+        for job, job_queue in released:
+            enqueue_with_priority(job_queue, job)
+
+    def _take_released(self) -> List[Tuple[object, object]]:
+        ready = [entry for entry in self.parked if not self.congested.intersection(entry[2])]
+        if ready:
+            self.parked = [entry for entry in self.parked if self.congested.intersection(entry[2])]
+        return [(job, job_queue) for job, job_queue, _ in ready]
+
+    def park(self, job, job_queue, downstream: Iterable[str]) -> bool:
+        """
+        Parks a producer if any of its downstream job classes is congested. Returns True if parked;
+        the job is re-enqueued automatically once they drain.
+        """
+        if not self.enabled:
+            return False
+        downstream = tuple(downstream)
+        with self.lock:
+            if not self.congested.intersection(downstream):
+                return False
+            # Recorded as pending before anyone can release it, so a crash while parked resumes it
+            job_store.mark_pending(job)
+            self.parked.append((job, job_queue, downstream))
+            self.pauses += 1
+            return True
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                "queued": {job_type: self.queued[job_type] for job_type in self.watermarks},
+                "congested": sorted(self.congested),
+                "parked": len(self.parked),
+                "pauses": self.pauses,
+            }
+
+
+backpressure = Backpressure()
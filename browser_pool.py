@@ -0,0 +1,118 @@
+import threading
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from typing import Generator, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+
+from config import BROWSER_POOL_CONFIG
+
+
+class PooledBrowser:
+    """
+    A long-lived headless Chrome plus the number of pages it has served.
+    """
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """
+    Bounded pool of headless Chrome instances for the Selenium fallback. Browsers are leased per fetch,
+    returned for reuse, and quit after max_pages_per_browser pages or when a fetch raises.
+    """
+    def __init__(self, size: int = BROWSER_POOL_CONFIG["size"],
+                 max_pages_per_browser: int = BROWSER_POOL_CONFIG["max_pages_per_browser"],
+                 ready_timeout: float = BROWSER_POOL_CONFIG["ready_timeout"]):
+        self.size = max(1, size)
+        self.max_pages_per_browser = max_pages_per_browser
+        self.ready_timeout = ready_timeout
+        self.idle: LifoQueue = LifoQueue()
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.lock = threading.Lock()
+        self.driver_path: Optional[str] = None
+        self.launched = 0
+        self.recycled = 0
+
+    def _get_driver_path(self) -> str:
+        with self.lock:
+            if self.driver_path is None:
+                self.driver_path = ChromeDriverManager().install()
+            return self.driver_path
+
+    def _launch(self) -> PooledBrowser:
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920x1080")
+        options.add_argument("--log-level=3")
+        driver = webdriver.Chrome(service=Service(self._get_driver_path(), log_path="/dev/null"), options=options)
+        with self.lock:
+            self.launched += 1
+        return PooledBrowser(driver)
+
+    def _retire(self, browser: PooledBrowser) -> None:
+        with self.lock:
+            self.recycled += 1
+        try:
+            browser.driver.quit()
+        except WebDriverException:
+            pass
+
+    @contextmanager
+    def lease(self) -> Generator[webdriver.Chrome, None, None]:
+        """
+        Yields a driver for one fetch. A fetch that raises discards the browser instead of returning it.
+        """
+        self.slots.acquire()
+        try:
+            try:
+                browser = self.idle.get_nowait()
+            except Empty:
+                browser = self._launch()
+
+            healthy = False
+            try:
+                yield browser.driver
+                healthy = True
+            finally:
+                browser.pages += 1
+                if healthy and browser.pages < self.max_pages_per_browser:
+                    self.idle.put(browser)
+                else:
+                    self._retire(browser)
+        finally:
+            self.slots.release()
+
+    def wait_until_ready(self, driver: webdriver.Chrome, selector: Optional[str]) -> None:
+        """
+        Waits until `selector` is present. A timeout is not an error: empty result pages and
+        unlisted detail pages legitimately lack the element.
+        """
+        if not selector:
+            return
+        try:
+            WebDriverWait(driver, self.ready_timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+            )
+        except TimeoutException:
+            pass
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                browser = self.idle.get_nowait()
+            except Empty:
+                break
+            self._retire(browser)
+
+
+browser_pool = BrowserPool()
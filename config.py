@@ -10,9 +10,12 @@ SEARCH_CONFIG = {
     # Cost per mile for estimating vehicle shipping
     "shipping_cost_per_mile": 0.70,
 
-    # Number of search result pages to scrape
+    # Maximum number of search result pages to scrape per model and scope
     "pages": 40,
 
+    # Read the result count from page 1 and only enqueue the pages that actually have listings
+    "adaptive_pagination": True,
+
     # Number of listings per page
     "page_size": 100,
 
@@ -34,12 +37,16 @@ SEARCH_CONFIG = {
 }
 
 JOB_PRIORITIES = {
+    "ParseJob": 0,
     "PageLoadJob": 1,
     "ListingIDResolutionJob": 2,
     "DetailScrapeJob": 3,
     "VerifierJob": 4,
     "SaveJob": 5,
-    "FlushSaveBufferJob": 6
+    "FlushSaveBufferJob": 6,
+    "DetailBackfillJob": 7,
+    "BackfillDetailJob": 8,
+    "BackfillSaveJob": 5
 }
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -48,3 +55,296 @@ PAGE_SIZE = 100
 BASE_URL = "https://www.cars.com/shopping/results/"
 
 ENQUEUE_BATCH_SIZE = 25
+
+# Seconds a buffered listing may wait before the save buffer is flushed, even if it isn't full
+SAVE_BUFFER_MAX_AGE = 30
+
+BACKPRESSURE_CONFIG = {
+    # Park producers (fetch jobs, ListingIDResolutionJob and the batch producers) while the
+    # jobs they feed are backed up; False lets queues grow without bound
+    "enabled": True,
+
+    # Queued jobs per class as (high, low): at high the class is congested and its producers pause,
+    # and they resume once it drains to low
+    "watermarks": {
+        "ListingIDResolutionJob": (20, 5),
+        "DetailScrapeJob": (500, 100),
+        "VerifyDetailJob": (500, 100),
+        "BackfillDetailJob": (500, 100),
+        "SaveJob": (2000, 500),
+        "ParseJob": (200, 50),  # fetched pages waiting on the parse pool (threaded engine)
+    },
+}
+
+VERIFIER_CONFIG = {
+    # Detail pages the verifier may fetch per run; listings that don't fit wait for the next run,
+    # where their older last_seen ranks them higher
+    "max_per_run": 2000,
+
+    # Score = days since last seen * days_weight
+    #       + (1 - price / average price of listings with the same title) * price_weight
+    #       + local_bonus for listings found by the local search
+    # Highest score is verified first
+    "days_weight": 1.0,
+    "price_weight": 10.0,
+    "local_bonus": 5.0,
+}
+
+DELTA_CONFIG = {
+    # Delta mode (main.py --delta): request results newest-first and page through them one at a
+    # time, stopping a model/scope once a page is almost entirely listings already in the DB.
+    # Known listings that aren't reached are still refreshed by the verifier.
+    "enabled": False,
+
+    # Sort order requested from the results pages in delta mode
+    "sort": "listed_at_desc",
+
+    # Fraction of a page's cards that must already be known to stop paging
+    "stop_known_ratio": 0.9,
+}
+
+SHARDING_CONFIG = {
+    # Shared lease table for --coordinator/--worker runs; put it (and DB_PATH) on a share every
+    # worker host can reach to spread a run across machines
+    "path": os.path.join(BASE_DIR, "data", "work_units.db"),
+
+    # Result pages per work unit; each unit is one model and scope
+    "pages_per_unit": 10,
+
+    # Seconds a lease stays valid without a heartbeat before another worker may take the unit
+    "lease_seconds": 120,
+
+    # Seconds between coordinator progress reports
+    "poll_seconds": 15,
+
+    # Output of workers started with --spawn
+    "log_dir": os.path.join(BASE_DIR, "data", "logs"),
+}
+
+RUN_DEADLINE_CONFIG = {
+    # Wall-clock limit for a run in minutes (main.py --max-runtime); None runs until the queue is empty
+    "max_runtime_minutes": None,
+
+    # Minutes before the deadline at which new fetches stop, leaving time to drain and flush
+    "drain_minutes": 5,
+
+    # Where the report of skipped work is written
+    "report_dir": os.path.join(BASE_DIR, "data", "logs"),
+}
+
+JOB_STORE_CONFIG = {
+    # Record queued jobs and buffered listings in SQLite so a crashed run can continue with
+    # main.py --resume (--resume turns this on for that run)
+    "enabled": False,
+
+    "path": os.path.join(BASE_DIR, "data", "job_store.db"),
+}
+
+# Pragmas applied to every SQLite connection (listings DB, job store and work-unit leases)
+SQLITE_CONFIG = {
+    # WAL lets the dashboard read while the scraper writes; it needs every process on the same
+    # host, so use "DELETE" if DB_PATH is on a network share
+    "journal_mode": "WAL",
+
+    # NORMAL only syncs at WAL checkpoints, which is safe in WAL mode
+    "synchronous": "NORMAL",
+
+    # Milliseconds a connection waits on another's lock before "database is locked"
+    "busy_timeout_ms": 30000,
+
+    # Page cache per connection, and how much of the file to memory-map
+    "cache_size_kib": 64 * 1024,
+    "mmap_size_bytes": 256 * 1024 * 1024,
+
+    "temp_store": "MEMORY",
+}
+
+QUEUE_CONFIG = {
+    # "aging": a queued job's effective priority improves by its class weight for every second it
+    # waits, so lower-priority work is not starved while PageLoadJobs keep arriving.
+    # "strict": plain priority order
+    "scheduling": "aging",
+
+    # Priority levels gained per second of waiting, by job class (keyed like JOB_PRIORITIES)
+    "default_aging_weight": 0.05,
+    "aging_weights": {
+        "PageLoadJob": 0.0,
+        "ListingIDResolutionJob": 0.2,
+        "DetailScrapeJob": 0.2,
+        "VerifyDetailJob": 0.1,
+        "SaveJob": 0.5,
+        "FlushSaveBufferJob": 1.0,
+    },
+}
+
+DETAIL_BACKFILL_CONFIG = {
+    # Save new listings from search-card data right away (VIN pending) instead of scraping
+    # their detail page first; detail enrichment then runs as a low-priority backfill
+    "card_only": False,
+
+    # Start the backfill in the same run once all result pages are processed; when False,
+    # pending listings wait for a later run (e.g. main.py --backfill-only)
+    "backfill_in_run": True,
+
+    # Detail pages the backfill may fetch per run
+    "max_per_run": 1000,
+}
+
+# HTML parser backend: "auto" (lxml when installed, else html.parser), "lxml", "bs4-lxml" or "html.parser"
+HTML_PARSER = "auto"
+
+# Worker processes that parse downloaded pages off the GIL; 0 parses inline on the fetching thread
+PARSE_POOL_SIZE = max(1, (os.cpu_count() or 2) - 1)
+
+# Threaded engine: named worker pools, each with its own queue and thread count
+WORKER_POOLS = {
+    "fetch": 32,                        # page downloads (network-bound)
+    "parse": max(1, PARSE_POOL_SIZE),   # hands fetched pages to the parse processes and runs their handlers
+    "db_write": 1,                      # SQLite allows one writer at a time
+    "db_read": 2,
+}
+
+# Pool each job class runs on, keyed like JOB_PRIORITIES; unlisted classes run on "fetch"
+JOB_POOLS = {
+    "PageLoadJob": "fetch",
+    "DetailScrapeJob": "fetch",
+    "VerifyDetailJob": "fetch",
+    "BackfillDetailJob": "fetch",
+    "ParseJob": "parse",
+    "ListingIDResolutionJob": "db_read",
+    "VerifierJob": "db_read",
+    "VerifierProducerJob": "db_read",
+    "DetailBackfillJob": "db_read",
+    "SaveJob": "db_write",
+    "FlushSaveBufferJob": "db_write",
+    "BackfillSaveJob": "db_write",
+}
+
+RESPONSE_CACHE_CONFIG = {
+    # "normal" reads fresh entries and stores new fetches, "replay" serves only from cache
+    # (no network at all), "off" bypasses the cache
+    "mode": "normal",
+
+    # Where compressed pages are stored
+    "dir": os.path.join(BASE_DIR, "data", "http_cache"),
+
+    # Seconds a cached page stays fresh, by page type
+    "ttl_seconds": {
+        "results": 30 * 60,
+        "detail": 12 * 60 * 60,
+    },
+
+    # Pruned at startup in "normal" mode: entries older than max_age_days are deleted, then the
+    # oldest until the cache fits in max_size_mb (stale entries are also deleted when read)
+    "max_age_days": 7,
+    "max_size_mb": 1024,
+}
+
+HTTP_POOL_CONFIG = {
+    # Cached sessions (one per user agent) kept alive per worker thread; least recently used is closed first
+    "sessions_per_thread": 4,
+
+    # Host connection pools per session, and idle connections kept per host
+    "pool_connections": 2,
+    "pool_maxsize": 2,
+
+    # Reuse TCP/TLS connections between requests; False sends "Connection: close"
+    "keep_alive": True,
+
+    # Seconds to wait for a response before giving up on a user agent
+    "timeout": 5,
+}
+
+# Execution engine used by main.py: "threads" (Worker pool) or "async" (asyncio fetch engine)
+EXECUTION_ENGINE = "threads"
+
+ASYNC_CONFIG = {
+    # Page fetches allowed in flight at once in the asyncio engine
+    "concurrency": 100,
+
+    # Threads that run parsing and DB jobs off the event loop
+    "blocking_workers": 8,
+}
+
+RATE_LIMIT_CONFIG = {
+    # Starting request rate (requests/second) for any host not listed in "hosts"
+    "default_rate": 4.0,
+
+    # Per-host starting rates
+    "hosts": {
+        "www.cars.com": 4.0,
+    },
+
+    # Bounds the adaptive rate may move between
+    "min_rate": 0.25,
+    "max_rate": 8.0,
+
+    # Requests that may start back-to-back after an idle period
+    "burst": 2,
+
+    # Random +/- fraction applied to each slot interval so requests don't land on a fixed beat
+    "jitter": 0.3,
+
+    # Rate is multiplied by backoff_factor on every non-200, and raised by increase_step
+    # after success_streak consecutive successes
+    "backoff_factor": 0.5,
+    "increase_step": 0.25,
+    "success_streak": 20,
+
+    # Threaded engine: a fetch job whose host slot (or breaker cooldown) is further off than this
+    # many seconds goes back on the queue until then, instead of holding its worker asleep
+    "max_thread_wait": 0.5,
+}
+
+UA_REGISTRY_CONFIG = {
+    # Outcomes per user agent used to compute its recent success rate for weighted selection
+    "recent_window": 20,
+
+    # Agents whose smoothed recent success rate drops below this leave the rotation; above it,
+    # selection is weighted by the rate
+    "min_success_rate": 0.2,
+
+    # Seconds between background snapshots of the registry to the user agent log files
+    "snapshot_interval": 60,
+}
+
+BROWSER_POOL_CONFIG = {
+    # Headless Chrome instances kept alive for the Selenium fallback
+    "size": 2,
+
+    # Pages a browser serves before it is quit and replaced
+    "max_pages_per_browser": 50,
+
+    # Seconds to wait for the page-type selector below before reading the page anyway
+    "ready_timeout": 10,
+
+    # Element that marks a page as rendered, by page type
+    "ready_selectors": {
+        "results": "div.vehicle-card",
+        "detail": "dt",
+    },
+}
+
+FETCH_POLICY_CONFIG = {
+    # User agents tried per fetch from the known pool, then again from generated agents
+    "attempts_per_fetch": 3,
+
+    # Host pause (seconds) after a 429 that carries no usable Retry-After header
+    "default_retry_after": 30,
+
+    # Longest host pause (seconds) a Retry-After header can ask for; longer values are clamped
+    "max_retry_after": 300,
+
+    # Circuit breaker: over the last breaker_window outcomes (once at least breaker_min_samples),
+    # an error rate at or above breaker_error_rate pauses all fetching for breaker_cooldown seconds
+    "breaker_window": 50,
+    "breaker_min_samples": 20,
+    "breaker_error_rate": 0.5,
+    "breaker_cooldown": 120,
+
+    # Failed fetch jobs are re-enqueued at deferred_priority (behind all other work) while the
+    # per-run retry budget lasts, at most max_deferrals_per_job times each
+    "retry_budget": 2000,
+    "max_deferrals_per_job": 3,
+    "deferred_priority": 9,
+}
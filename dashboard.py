@@ -1,23 +1,23 @@
-import sqlite3
 import pandas as pd
 import streamlit as st
 import matplotlib.pyplot as plt
 from datetime import date, timedelta
 from config import DB_PATH
+from sqlite_connections import connect
 
 st.set_page_config(layout="wide")
 st.title("🚘 Car Market Summary Dashboard")
 
 @st.cache_data(ttl=60)
 def load_cleaned():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     df = pd.read_sql_query("SELECT * FROM cleaned_listings", conn, parse_dates=['first_seen', 'last_seen'])
     conn.close()
     return df
 
 df = load_cleaned()
 
-conn = sqlite3.connect(DB_PATH)
+conn = connect(DB_PATH)
 price_history = pd.read_sql_query("SELECT * FROM price_history", conn, parse_dates=['date'])
 conn.close()
 
@@ -1,26 +1,45 @@
 import os
 import sqlite3
 from datetime import date
-from config import DB_PATH
+from config import DB_PATH, VERIFIER_CONFIG
+from sqlite_connections import ConnectionManager, connect
 from contextlib import contextmanager
 from typing import Optional, Generator, List, Dict, Tuple
 
+# Listings saved from search-card data before their detail page is scraped are keyed by this
+# placeholder until the detail backfill supplies the real VIN
+PENDING_VIN_PREFIX = "pending:"
+
+
+def pending_vin(listing_id: str) -> str:
+    return f"{PENDING_VIN_PREFIX}{listing_id}"
+
+
+def is_pending_vin(vin: Optional[str]) -> bool:
+    return bool(vin) and vin.startswith(PENDING_VIN_PREFIX)
+
+
+# One persistent connection per thread to the listings DB
+db_connections = ConnectionManager(DB_PATH)
+
 
 @contextmanager
 def get_db_conn(existing_conn: Optional[sqlite3.Connection] = None) -> Generator[sqlite3.Connection, None, None]:
     if existing_conn:
         yield existing_conn
     else:
-        conn = sqlite3.connect(DB_PATH)
+        conn = db_connections.get()
         try:
             yield conn
-        finally:
-            conn.close()
+        except BaseException:
+            # The connection outlives this call, so don't leave a half-done transaction open on it
+            conn.rollback()
+            raise
 
 
 def init_db():
-    os.makedirs("data", exist_ok=True)
-    with sqlite3.connect(DB_PATH) as conn:
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    with get_db_conn(existing_conn=None) as conn:
         cur = conn.cursor()
 
         # Main listings table using VIN as the unique identifier
@@ -59,6 +78,59 @@ def init_db():
         """)
 
         conn.commit()
+        migrate(conn)
+
+
+# Schema changes since the original tables, applied in order. The DB's PRAGMA user_version records
+# the last one applied; add new steps to the end and never edit one that has shipped.
+MIGRATIONS = [
+    ("index hot listing and price_history lookups", """
+        CREATE INDEX IF NOT EXISTS idx_listings_listing_id ON listings (listing_id);
+        CREATE INDEX IF NOT EXISTS idx_listings_status_last_seen ON listings (status, last_seen);
+        CREATE INDEX IF NOT EXISTS idx_price_history_date_vin ON price_history (date, vin);
+    """),
+    ("one price_history row per vin and day", """
+        DELETE FROM price_history WHERE id NOT IN (SELECT MIN(id) FROM price_history GROUP BY vin, date);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_price_history_vin_date ON price_history (vin, date);
+    """),
+    # Until the INSERT column order was fixed, a new listing stored its price in title and its title
+    # in price, and every later upsert without a title (ListingIDResolutionJob) set price to NULL
+    ("swap back titles and prices stored in each other's columns", """
+        UPDATE listings SET title = price, price = CAST(title AS INTEGER)
+        WHERE typeof(price) = 'text' AND (title IS NULL OR title NOT GLOB '*[^0-9]*');
+        UPDATE listings SET price = CAST(title AS INTEGER), title = NULL
+        WHERE price IS NULL AND title GLOB '[0-9]*' AND title NOT GLOB '*[^0-9]*';
+    """),
+]
+
+
+def _split_statements(script: str) -> List[str]:
+    return [statement.strip() for statement in script.split(";") if statement.strip()]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Applies pending MIGRATIONS, each in its own transaction together with its user_version bump,
+    so an interrupted migration is rolled back and retried on the next start. Returns the schema
+    version. Safe when several processes start at once: the write lock is taken before the version
+    is read.
+    """
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                return version
+            description, script = MIGRATIONS[version]
+            for statement in _split_statements(script):
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"[db] migrated schema to version {version + 1}: {description}")
 
 
 def get_vins_by_listing_ids(listing_ids: List[str]) -> dict:
@@ -73,13 +145,45 @@ def get_vins_by_listing_ids(listing_ids: List[str]) -> dict:
     return {listing_id: vin for listing_id, vin in rows}
 
 
+def get_listing_index() -> Dict[str, str]:
+    """
+    Returns {listing_id: vin} for every stored listing.
+    """
+    with get_db_conn(existing_conn=None) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT listing_id, vin FROM listings WHERE listing_id IS NOT NULL")
+        return {listing_id: vin for listing_id, vin in cur.fetchall()}
+
+
+def _resolve_backfilled_vins(cur: sqlite3.Cursor, listings: List[Dict]) -> None:
+    """
+    Swaps placeholder VINs for real ones when the detail backfill already ran for that listing.
+    """
+    pending_ids = [listing['listing_id'] for listing in listings if is_pending_vin(listing.get('vin'))]
+    if not pending_ids:
+        return
+    placeholders = ','.join('?' for _ in pending_ids)
+    cur.execute(f"SELECT listing_id, vin FROM listings WHERE listing_id IN ({placeholders})", pending_ids)
+    current = {listing_id: vin for listing_id, vin in cur.fetchall() if not is_pending_vin(vin)}
+    for listing in listings:
+        if is_pending_vin(listing.get('vin')) and listing['listing_id'] in current:
+            listing['vin'] = current[listing['listing_id']]
+
+
 def flush_listings_to_db(listings: List[Dict]) -> None:
     if not listings:
         return
 
+    with get_db_conn(existing_conn=None) as conn:
+        _resolve_backfilled_vins(conn.cursor(), listings)
+
+    # Verification results carry only the VIN and what the detail page confirmed
+    verifications = [listing for listing in listings if 'listing_id' not in listing and listing.get('vin')]
+    listings = [listing for listing in listings if 'listing_id' in listing]
+
     insert_values = [
         (
-            listing['vin'], listing['listing_id'], listing['price'], listing.get('title'), listing.get('mileage'),
+            listing['vin'], listing['listing_id'], listing.get('title'), listing['price'], listing.get('mileage'),
             listing.get('dealer'), listing.get('location'), listing.get('distance'), listing.get('shipping_cost'),
             listing.get('search_scope'), listing.get('url'), listing.get('image_url'),
             listing.get('days_on_market'), listing.get('date_added'), listing.get('msrp')
@@ -87,7 +191,7 @@ def flush_listings_to_db(listings: List[Dict]) -> None:
     ]
 
     price_log_candidates = [
-        (listing['vin'], listing['price']) for listing in listings
+        (listing['vin'], listing['price']) for listing in listings + verifications
         if listing.get('vin') and listing.get('price') is not None
     ]
 
@@ -102,56 +206,113 @@ def flush_listings_to_db(listings: List[Dict]) -> None:
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(vin) DO UPDATE SET
                 price = excluded.price,
+                search_scope = CASE WHEN listings.search_scope = 'local' THEN 'local'
+                                    ELSE COALESCE(excluded.search_scope, listings.search_scope) END,
                 last_seen = CURRENT_DATE
         """, insert_values)
 
-        # Batch deduplication for price history
-        if price_log_candidates:
-            vin_set = {vin for vin, _ in price_log_candidates}
-            placeholders = ','.join('?' for _ in vin_set)
-            cur.execute(
-                f"SELECT vin FROM price_history WHERE date = ? AND vin IN ({placeholders})",
-                (date.today(), *vin_set)
-            )
-            existing_vins = {row[0] for row in cur.fetchall()}
-
-            new_price_logs = [
-                (vin, date.today(), price)
-                for vin, price in price_log_candidates
-                if vin not in existing_vins
-            ]
-
-            if new_price_logs:
-                cur.executemany(
-                    "INSERT INTO price_history (vin, date, price) VALUES (?, ?, ?)",
-                    new_price_logs
-                )
+        _apply_verifications(cur, verifications)
+
+        # The first price logged for a VIN each day wins (UNIQUE (vin, date))
+        cur.executemany(
+            "INSERT OR IGNORE INTO price_history (vin, date, price) VALUES (?, ?, ?)",
+            [(vin, date.today(), price) for vin, price in price_log_candidates]
+        )
 
         conn.commit()
 
 
-def get_all_active_listing_ids(today: date = date.today()) -> List[Tuple[str, str]]:
+def _apply_verifications(cur: sqlite3.Cursor, verifications: List[Dict]) -> None:
+    cur.executemany("UPDATE listings SET status = 'inactive' WHERE vin = ?",
+                    [(v['vin'],) for v in verifications if v.get('status') == 'inactive'])
+    cur.executemany("UPDATE listings SET last_seen = ?, price = COALESCE(?, price) WHERE vin = ?",
+                    [(v.get('last_seen', date.today()), v.get('price'), v['vin'])
+                     for v in verifications if v.get('status') != 'inactive'])
+
+
+def get_pending_listings(limit: int) -> List[Tuple[str, str]]:
+    """
+    Returns (listing_id, url) for active listings still waiting on a detail backfill, oldest first.
+    """
     query = """
-        SELECT vin, url FROM listings
-        WHERE status = 'active' AND last_seen < ?
+        SELECT listing_id, url FROM listings
+        WHERE vin LIKE ? AND status = 'active'
+        ORDER BY rowid
+        LIMIT ?
     """
     with get_db_conn(existing_conn=None) as conn:
         cur = conn.cursor()
-        cur.execute(query, (today,))
+        cur.execute(query, (PENDING_VIN_PREFIX + '%', limit))
         return cur.fetchall()
 
 
+def backfill_pending_listing(listing_id: str, details: Dict) -> None:
+    """
+    Replaces a listing's placeholder VIN with the real one and fills in detail-page fields.
+    If the VIN is already stored under another row, the placeholder row is merged into it.
+    """
+    placeholder = pending_vin(listing_id)
+    vin = details['vin']
+    with get_db_conn(existing_conn=None) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM listings WHERE vin = ?", (vin,))
+        if cur.fetchone():
+            cur.execute("UPDATE listings SET listing_id = ?, last_seen = CURRENT_DATE WHERE vin = ?",
+                        (listing_id, vin))
+            cur.execute("""
+                UPDATE price_history SET vin = ?
+                WHERE vin = ? AND date NOT IN (SELECT date FROM price_history WHERE vin = ?)
+            """, (vin, placeholder, vin))
+            cur.execute("DELETE FROM price_history WHERE vin = ?", (placeholder,))
+            cur.execute("DELETE FROM listings WHERE vin = ?", (placeholder,))
+        else:
+            cur.execute("""
+                UPDATE listings SET
+                    vin = ?, mileage = ?, days_on_market = ?, date_added = ?,
+                    msrp = COALESCE(msrp, ?), status = ?
+                WHERE vin = ?
+            """, (vin, details.get('mileage'), details.get('days_on_market'), details.get('date_added'),
+                  details.get('msrp'), details.get('status', 'active'), placeholder))
+            cur.execute("UPDATE price_history SET vin = ? WHERE vin = ?", (vin, placeholder))
+        conn.commit()
+
+
+def get_verification_candidates(today: date = date.today(), config: Dict = VERIFIER_CONFIG) -> Generator[Tuple[str, str, str], None, None]:
+    """
+    Yields (vin, url, listing_id) for active listings not seen today, highest verification score
+    first (see VERIFIER_CONFIG). The segment average is taken over all active listings with the
+    same title, not only the stale ones.
+    """
+    query = """
+        WITH segment AS (
+            SELECT vin, url, listing_id, last_seen, search_scope, price,
+                   AVG(price) OVER (PARTITION BY title) AS segment_price
+            FROM listings
+            WHERE status = 'active' AND vin NOT LIKE ?
+        )
+        SELECT vin, url, listing_id FROM segment
+        WHERE last_seen < ?
+        ORDER BY
+            COALESCE(julianday(?) - julianday(last_seen), 0) * ?
+            + COALESCE(1.0 - price / NULLIF(segment_price, 0), 0) * ?
+            + CASE WHEN search_scope = 'local' THEN ? ELSE 0 END
+            DESC, last_seen
+    """
+    params = (PENDING_VIN_PREFIX + "%", today, today,
+              config["days_weight"], config["price_weight"], config["local_bonus"])
+    with get_db_conn(existing_conn=None) as conn:
+        yield from conn.execute(query, params)
+
+
 def log_price(vin: str, price: int, conn: Optional[sqlite3.Connection] = None) -> None:
     with get_db_conn(conn) as db:
-        cur = db.cursor()
-        cur.execute("SELECT 1 FROM price_history WHERE vin = ? AND date = ?", (vin, date.today()))
-        if cur.fetchone() is None:
-            cur.execute("INSERT INTO price_history (vin, date, price) VALUES (?, ?, ?)", (vin, date.today(), price))
-            db.commit()
+        db.execute("INSERT OR IGNORE INTO price_history (vin, date, price) VALUES (?, ?, ?)",
+                   (vin, date.today(), price))
+        db.commit()
 
 
 def refresh_cleaned_listings(db_path=DB_PATH):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cur = conn.cursor()
 
     cur.execute("DROP TABLE IF EXISTS cleaned_listings;")
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+from config import FETCH_POLICY_CONFIG
+from rate_limiter import rate_scheduler
+from user_agent_tracking import log_user_agent
+
+OK = "ok"
+TIMEOUT = "timeout"
+CONNECTION_ERROR = "connection_error"
+FORBIDDEN = "forbidden"
+RATE_LIMITED = "rate_limited"
+SERVER_ERROR = "server_error"
+CLIENT_ERROR = "client_error"
+EMPTY = "empty"
+# No request was made: waiting for a slot or the breaker would have run past the run deadline
+DEADLINE = "deadline"
+
+# Failures that say nothing about the user agent; trying more agents on the same URL only adds load
+HOST_FAILURES = {RATE_LIMITED, SERVER_ERROR}
+
+# Failures that look like the site rejecting this particular user agent
+USER_AGENT_FAILURES = {FORBIDDEN, EMPTY, CLIENT_ERROR}
+
+# Outcomes after which no other user agent is tried for the URL
+GIVE_UP_OUTCOMES = HOST_FAILURES | {DEADLINE}
+
+
+def classify_response(status_code: int, body: str) -> str:
+    if status_code == 200:
+        return OK if body.strip() else EMPTY
+    if status_code == 403:
+        return FORBIDDEN
+    if status_code == 429:
+        return RATE_LIMITED
+    if status_code >= 500:
+        return SERVER_ERROR
+    return CLIENT_ERROR
+
+
+def parse_retry_after(value: Optional[str],
+                      max_seconds: float = FETCH_POLICY_CONFIG["max_retry_after"]) -> Optional[float]:
+    """
+    Parses a Retry-After header given either as delay-seconds or as an HTTP date, clamped to
+    max_seconds so one response can't stall every fetch to the host for hours.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), max_seconds)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return min(max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds()), max_seconds)
+
+
+class CircuitBreaker:
+    """
+    Trips when the recent fetch error rate crosses a threshold, pausing every fetch
+    (threaded and async) until the cooldown ends.
+    """
+    def __init__(self, window: int = FETCH_POLICY_CONFIG["breaker_window"],
+                 min_samples: int = FETCH_POLICY_CONFIG["breaker_min_samples"],
+                 error_rate: float = FETCH_POLICY_CONFIG["breaker_error_rate"],
+                 cooldown: float = FETCH_POLICY_CONFIG["breaker_cooldown"]):
+        self.outcomes = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def record(self, outcome: str) -> None:
+        with self.lock:
+            self.outcomes.append(outcome != OK)
+            if len(self.outcomes) < self.min_samples:
+                return
+            if sum(self.outcomes) / len(self.outcomes) >= self.error_rate:
+                self.open_until = time.monotonic() + self.cooldown
+                self.trips += 1
+                self.outcomes.clear()
+                print(f"[circuit breaker] error rate over {self.error_rate:.0%}, pausing fetches for {self.cooldown}s")
+
+    def remaining(self) -> float:
+        with self.lock:
+            return max(0.0, self.open_until - time.monotonic())
+
+    def _next_wait(self, give_up_at: Optional[float]) -> Tuple[float, bool]:
+        # (seconds to sleep, whether to give up after sleeping them)
+        delay = self.remaining()
+        if delay > 0 and give_up_at is not None and time.monotonic() + delay > give_up_at:
+            return max(0.0, give_up_at - time.monotonic()), True
+        return delay, False
+
+    def wait_until_closed(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Blocks while the breaker is open. Returns False if it was still open after max_wait seconds.
+        """
+        give_up_at = None if max_wait is None else time.monotonic() + max_wait
+        delay, give_up = self._next_wait(give_up_at)
+        while delay > 0 or give_up:
+            time.sleep(delay)
+            if give_up:
+                return False
+            delay, give_up = self._next_wait(give_up_at)
+        return True
+
+    async def wait_until_closed_async(self, max_wait: Optional[float] = None) -> bool:
+        give_up_at = None if max_wait is None else time.monotonic() + max_wait
+        delay, give_up = self._next_wait(give_up_at)
+        while delay > 0 or give_up:
+            await asyncio.sleep(delay)
+            if give_up:
+                return False
+            delay, give_up = self._next_wait(give_up_at)
+        return True
+
+
+class RetryBudget:
+    """
+    Per-run allowance of deferred retries for failed fetch jobs.
+    """
+    def __init__(self, total: int = FETCH_POLICY_CONFIG["retry_budget"]):
+        self.remaining = total
+        self.spent = 0
+        self.lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            self.spent += 1
+            return True
+
+
+circuit_breaker = CircuitBreaker()
+
+
+def record_fetch_outcome(url: str, ua: str, outcome: str, latency: Optional[float] = None,
+                         retry_after: Optional[float] = None) -> None:
+    """
+    Feeds one request outcome to the rate scheduler, circuit breaker and user agent registry.
+    """
+    success = outcome == OK
+    rate_scheduler.record(url, success)
+    circuit_breaker.record(outcome)
+    if success or outcome in USER_AGENT_FAILURES:
+        log_user_agent(ua, success=success, latency=latency)
+    if retry_after is not None:
+        rate_scheduler.pause(url, retry_after)
+    elif outcome == RATE_LIMITED:
+        rate_scheduler.pause(url, FETCH_POLICY_CONFIG["default_retry_after"])
@@ -0,0 +1,157 @@
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import HTTP_POOL_CONFIG
+
+
+class PoolStats:
+    """
+    Thread-safe counters for session and connection reuse.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.sessions_created = 0
+        self.sessions_reused = 0
+        self.sessions_evicted = 0
+
+    def record_request(self) -> None:
+        with self.lock:
+            self.requests += 1
+
+    def record_new_connection(self) -> None:
+        with self.lock:
+            self.new_connections += 1
+
+    def record_session(self, reused: bool) -> None:
+        with self.lock:
+            if reused:
+                self.sessions_reused += 1
+            else:
+                self.sessions_created += 1
+
+    def record_eviction(self) -> None:
+        with self.lock:
+            self.sessions_evicted += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": max(self.requests - self.new_connections, 0),
+                "sessions_created": self.sessions_created,
+                "sessions_reused": self.sessions_reused,
+                "sessions_evicted": self.sessions_evicted,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        pool_stats.record_new_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        pool_stats.record_new_connection()
+        return super()._new_conn()
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools report every newly opened connection to pool_stats.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+class SessionPool:
+    """
+    Keeps a small LRU of keep-alive sessions per worker thread, keyed by user agent,
+    so repeat requests to cars.com skip the TCP+TLS handshake.
+    """
+    def __init__(self, sessions_per_thread: int = HTTP_POOL_CONFIG["sessions_per_thread"],
+                 pool_connections: int = HTTP_POOL_CONFIG["pool_connections"],
+                 pool_maxsize: int = HTTP_POOL_CONFIG["pool_maxsize"],
+                 keep_alive: bool = HTTP_POOL_CONFIG["keep_alive"]):
+        self.sessions_per_thread = max(1, sessions_per_thread)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.local = threading.local()
+        self.all_sessions = set()
+        self.lock = threading.Lock()
+
+    def _new_session(self, ua: str) -> requests.Session:
+        session = requests.Session()
+        adapter = CountingHTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                      max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = ua
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        with self.lock:
+            self.all_sessions.add(session)
+        return session
+
+    def _close_session(self, session: requests.Session) -> None:
+        with self.lock:
+            self.all_sessions.discard(session)
+        session.close()
+
+    def get_session(self, ua: str) -> requests.Session:
+        """
+        Returns this thread's session for the given user agent, creating it if needed.
+        """
+        sessions = getattr(self.local, "sessions", None)
+        if sessions is None:
+            sessions = self.local.sessions = OrderedDict()
+
+        session = sessions.get(ua)
+        if session is not None:
+            sessions.move_to_end(ua)
+            pool_stats.record_session(reused=True)
+            return session
+
+        session = self._new_session(ua)
+        sessions[ua] = session
+        pool_stats.record_session(reused=False)
+
+        while len(sessions) > self.sessions_per_thread:
+            _, evicted = sessions.popitem(last=False)
+            self._close_session(evicted)
+            pool_stats.record_eviction()
+
+        return session
+
+    def get(self, url: str, ua: str, **kwargs) -> requests.Response:
+        pool_stats.record_request()
+        return self.get_session(ua).get(url, **kwargs)
+
+    def close_all(self) -> None:
+        """
+        Closes every session opened by any thread.
+        """
+        with self.lock:
+            sessions = list(self.all_sessions)
+            self.all_sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+session_pool = SessionPool()
@@ -1,19 +1,197 @@
+import heapq
+import time
 from abc import ABC, abstractmethod
-from queue import PriorityQueue
+from collections import deque
+from dataclasses import asdict
+from queue import Empty, PriorityQueue
 from threading import Thread, Lock
-from typing import Set, List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from itertools import count
+from config import FETCH_POLICY_CONFIG, QUEUE_CONFIG, RATE_LIMIT_CONFIG, SAVE_BUFFER_MAX_AGE, ENQUEUE_BATCH_SIZE
+from backpressure import backpressure
+from job_store import job_store
+from run_deadline import run_deadline
+from fetch_policy import RetryBudget, circuit_breaker
+from rate_limiter import rate_scheduler
+from response_cache import response_cache
+from utils.job_utils import enqueue_with_priority
 
 
 class Job(ABC):
     """
     Abstract base class for all jobs in the processing pipeline.
+    Jobs that can be resumed after a crash also define to_record() (JSON-safe constructor args)
+    and a from_record(args, shared_state) classmethod; see job_store.
     """
     @abstractmethod
     def run(self, job_queue: 'PrioritizedJobQueue') -> None:
         pass
 
 
+class FetchJob(Job):
+    """
+    Base class for jobs that fetch a single page and then process it. The fetched HTML is parsed into a
+    plain dict by the process-pool parse stage (see parse_pool.PARSERS for page_kind), and subclasses
+    keep their save logic in handle_parsed so the threaded Worker and the asyncio engine can share it.
+    Subclasses are expected to carry a shared_state attribute.
+    Failed fetches are deferred to the back of the queue while the run's retry budget lasts.
+    Fetches wait (parked) while any class in `downstream` is backed up, so downloaded pages don't
+    pile up in memory ahead of the parse pool.
+    """
+    page_kind = "detail"
+    downstream: Tuple[str, ...] = ("ParseJob",)
+    max_attempts = FETCH_POLICY_CONFIG["attempts_per_fetch"]
+    deferrals = 0
+    not_before = 0.0  # time.monotonic() before which the queue holds this job (see hold_for_slot)
+    started = False
+    parse_pending = False
+
+    @abstractmethod
+    def build_url(self) -> str:
+        pass
+
+    @abstractmethod
+    def handle_parsed(self, fields: Dict, job_queue: 'PrioritizedJobQueue') -> None:
+        pass
+
+    def handle_failure(self, job_queue: 'PrioritizedJobQueue') -> None:
+        pass
+
+    def handle_skipped(self, job_queue: 'PrioritizedJobQueue') -> None:
+        """
+        Called instead of fetching once the run's deadline has closed admission.
+        """
+        pass
+
+    def admit(self, job_queue: 'PrioritizedJobQueue') -> bool:
+        """
+        Checked before fetching; returning False means the job was parked or is not needed.
+        """
+        return True
+
+    def ready(self, job_queue: 'PrioritizedJobQueue') -> bool:
+        """
+        Both engines call this before fetching: skips the job past the deadline, parks it while its
+        downstream is congested, else asks admit().
+        """
+        if run_deadline.closing:
+            run_deadline.skip(self)
+            self.handle_skipped(job_queue)
+            return False
+        if backpressure.park(self, job_queue, self.downstream):
+            return False
+        return self.admit(job_queue)
+
+    def start(self) -> None:
+        if not self.started:
+            self.started = True
+            self.shared_state.tracker.record_start(self.__class__.__name__)
+
+    def defer(self, job_queue: 'PrioritizedJobQueue') -> bool:
+        """
+        Re-enqueues this job behind all other work. Returns False once its deferrals or the retry budget run out.
+        Once the deadline is closing the job is skipped instead, like in ready().
+        """
+        if run_deadline.closing:
+            run_deadline.skip(self)
+            self.handle_skipped(job_queue)
+            return True
+        if response_cache.replay or self.deferrals >= FETCH_POLICY_CONFIG["max_deferrals_per_job"]:
+            return False
+        if not self.shared_state.retry_budget.try_spend():
+            return False
+        self.deferrals += 1
+        enqueue_with_priority(job_queue, self, priority=FETCH_POLICY_CONFIG["deferred_priority"])
+        return True
+
+    def handle_html(self, html: str, job_queue: 'PrioritizedJobQueue') -> None:
+        from parse_pool import parse_pool
+        self.handle_parsed(parse_pool.parse(self.page_kind, html), job_queue)
+
+    def hold_for_slot(self, job_queue: 'PrioritizedJobQueue') -> bool:
+        """
+        Threaded engine: if the host's next request slot (or the breaker's cooldown) is more than
+        max_thread_wait away, puts this job back on the queue to run no earlier than then and returns
+        True, so the worker takes other work instead of sleeping. The deadline is checked again by
+        ready() when it comes back.
+        """
+        if response_cache.replay:
+            return False
+        wait = max(circuit_breaker.remaining(), rate_scheduler.wait_time(self.build_url()))
+        if wait <= RATE_LIMIT_CONFIG["max_thread_wait"]:
+            return False
+        self.not_before = time.monotonic() + wait
+        priority = FETCH_POLICY_CONFIG["deferred_priority"] if self.deferrals else None
+        enqueue_with_priority(job_queue, self, priority=priority)
+        return True
+
+    def run(self, job_queue: 'PrioritizedJobQueue') -> None:
+        from page_fetcher import fetch_html_with_fallback
+        if not self.ready(job_queue) or self.hold_for_slot(job_queue):
+            return
+        self.start()
+        html, _ = fetch_html_with_fallback(self.build_url(), self.max_attempts)
+        if html is None:
+            if not self.defer(job_queue):
+                self.handle_failure(job_queue)
+        else:
+            # Parsing continues on the parse pool so this fetch thread is free for the next download
+            self.parse_pending = True
+            enqueue_with_priority(job_queue, ParseJob(self, html))
+
+
+class ParseJob(Job):
+    """
+    Continuation of a FetchJob: parses its downloaded HTML and runs its handle_parsed.
+    """
+    def __init__(self, fetch_job: FetchJob, html: str):
+        self.fetch_job = fetch_job
+        self.html = html
+
+    def run(self, job_queue: 'PrioritizedJobQueue') -> None:
+        self.fetch_job.handle_html(self.html, job_queue)
+
+
+class ProducerJob(Job):
+    """
+    Base for jobs that feed a backlog of work into the queue ENQUEUE_BATCH_SIZE jobs at a time.
+    Each run emits one batch and re-enqueues the producer while work remains. While any class in
+    `downstream` is above its high watermark the producer is parked instead (see backpressure).
+    Subclasses implement pending() (the backlog list, consumed from the end) and make_job(item).
+    Subclasses are expected to carry a shared_state attribute.
+    """
+    downstream: Tuple[str, ...] = ()
+    batch_size = ENQUEUE_BATCH_SIZE
+
+    @abstractmethod
+    def pending(self) -> List:
+        pass
+
+    @abstractmethod
+    def make_job(self, item) -> Job:
+        pass
+
+    def run(self, job_queue: 'PrioritizedJobQueue') -> None:
+        if run_deadline.closing:
+            run_deadline.skip_backlog(self.__class__.__name__, len(self.pending()))
+            return
+        if backpressure.park(self, job_queue, self.downstream):
+            return
+
+        tracker = self.shared_state.tracker
+        tracker.record_start(self.__class__.__name__)
+
+        backlog = self.pending()
+        for _ in range(min(self.batch_size, len(backlog))):
+            enqueue_with_priority(job_queue, self.make_job(backlog.pop()))
+
+        # If there's still more work to do, enqueue another round
+        if backlog:
+            enqueue_with_priority(job_queue, self)
+
+        tracker.record_complete(self.__class__.__name__)
+
+
 class StopJob(Job):
     """
     Sentinel job to signal a worker to stop.
@@ -22,15 +200,114 @@ class StopJob(Job):
         raise StopIteration
 
 
+class AgingBuckets:
+    """
+    Scheduling core of the job queues. Items are (priority, order, job) tuples kept in FIFO buckets per
+    (job class, priority), so the head of each bucket is its longest-waiting job. get() returns the head
+    with the best effective priority: base priority minus seconds waited times the class's aging weight.
+    With every weight at zero this is plain priority order. Jobs put with a future not_before are held
+    aside and join their bucket once it passes; only PrioritizedJobQueue.get waits for them.
+    """
+    def __init__(self, scheduling: str = QUEUE_CONFIG["scheduling"]):
+        self.aging = scheduling == "aging"
+        self.buckets: Dict[Tuple[str, int], deque] = {}
+        self.held: List[Tuple[float, int, Tuple]] = []  # heap of (not_before, order, item)
+        self.size = 0
+
+    def weight(self, job_type: str) -> float:
+        if not self.aging:
+            return 0.0
+        return QUEUE_CONFIG["aging_weights"].get(job_type, QUEUE_CONFIG["default_aging_weight"])
+
+    def put(self, item: Tuple) -> None:
+        priority, order, job = item
+        self.size += 1
+        not_before = getattr(job, "not_before", 0.0)
+        if not_before > time.monotonic():
+            heapq.heappush(self.held, (not_before, order, item))
+            return
+        self._append(item, time.monotonic())
+
+    def _append(self, item: Tuple, enqueued_at: float) -> None:
+        priority, order, job = item
+        self.buckets.setdefault((job.__class__.__name__, priority), deque()).append((enqueued_at, item))
+
+    def _release_held(self, now: float) -> None:
+        while self.held and self.held[0][0] <= now:
+            _, _, item = heapq.heappop(self.held)
+            self._append(item, now)
+
+    def wait_time(self) -> Optional[float]:
+        """
+        Seconds until get() has a job to return: 0 if one is ready now, None if the queue is empty.
+        """
+        now = time.monotonic()
+        self._release_held(now)
+        if self.buckets:
+            return 0.0
+        return self.held[0][0] - now if self.held else None
+
+    def get(self) -> Tuple:
+        now = time.monotonic()
+        self._release_held(now)
+        best_key, best_rank = None, None
+        for key, bucket in self.buckets.items():
+            enqueued_at, (priority, order, job) = bucket[0]
+            rank = (priority - (now - enqueued_at) * self.weight(key[0]), order)
+            if best_rank is None or rank < best_rank:
+                best_key, best_rank = key, rank
+
+        bucket = self.buckets[best_key]
+        _, item = bucket.popleft()
+        if not bucket:
+            del self.buckets[best_key]
+        self.size -= 1
+        return item
+
+    def __len__(self) -> int:
+        return self.size
+
+
 class PrioritizedJobQueue(PriorityQueue):
     """
-    A simple alias for Queue to indicate job-specific use.
+    Job queue ordered by priority, with aging per QUEUE_CONFIG so waiting jobs are not starved.
     """
     def __init__(self):
         super().__init__()
         self.counter = count()
         self.lock = Lock()
 
+    def _init(self, maxsize):
+        self.queue = AgingBuckets()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        self.queue.put(item)
+
+    def _get(self):
+        return self.queue.get()
+
+    def get(self, block=True, timeout=None):
+        """
+        Queue.get, except that jobs held with a not_before time stay queued until it passes.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self.not_empty:
+            while True:
+                wait = self.queue.wait_time()
+                if wait == 0:
+                    item = self._get()
+                    self.not_full.notify()
+                    return item
+                remaining = None if end is None else end - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise Empty
+                if remaining is not None:
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.not_empty.wait(wait)
+
     def put_job(self, job, priority: int):
         with self.lock:
             order = next(self.counter)
@@ -40,85 +317,128 @@ class PrioritizedJobQueue(PriorityQueue):
 class Worker(Thread):
     """
     Thread worker that pulls and executes jobs from the job queue.
+    With worker pools, it pulls from its pool's inbox and jobs enqueue follow-ups through job_queue.
     """
-    def __init__(self, job_queue: PrioritizedJobQueue):
+    def __init__(self, job_queue: PrioritizedJobQueue, inbox: Optional[PrioritizedJobQueue] = None):
         super().__init__(daemon=True)
         self.job_queue = job_queue
+        self.inbox = inbox if inbox is not None else job_queue
 
     def run(self):
         while True:
-            priority, order, job = self.job_queue.get()
+            priority, order, job = self.inbox.get()
+            backpressure.job_dequeued(job.__class__.__name__)
+            attempt = None
+            failed = False
             try:
+                attempt = job_store.mark_running(job)
                 job.run(self.job_queue)
             except StopIteration:
                 break
             except Exception as e:
+                failed = True
                 print(f"[Worker Error] {e}")
             finally:
-                self.job_queue.task_done()
+                try:
+                    if attempt is not None:
+                        job_store.finish(job, attempt, failed)
+                except Exception as e:
+                    print(f"[Worker Error] job store: {e}")
+                self.inbox.task_done()
 
 
 class ListingBuffer:
     """
     Thread-safe buffer for batching listings before saving to the database.
     """
-    def __init__(self, batch_size: int):
+    def __init__(self, batch_size: int, max_age: float = SAVE_BUFFER_MAX_AGE):
         self.batch_size = batch_size
+        self.max_age = max_age
         self.buffer: List[Dict] = []
+        self.entry_ids: List[Optional[int]] = []  # job store rows, when crash-resume is on
+        self.oldest = None
         self.lock = Lock()
 
     def add(self, listing: Dict) -> bool:
         """
-        Add a listing to the buffer. Returns True if buffer reached batch size.
+        Add a listing to the buffer. Returns True if buffer reached batch size or its oldest
+        listing has waited max_age seconds, so saves reach the DB steadily during the run.
         """
+        entry_id = job_store.buffer_add("listings", listing) if job_store.enabled else None
         with self.lock:
+            if not self.buffer:
+                self.oldest = time.monotonic()
             self.buffer.append(listing)
-            return len(self.buffer) >= self.batch_size
+            self.entry_ids.append(entry_id)
+            if len(self.buffer) >= self.batch_size:
+                return True
+            if time.monotonic() - self.oldest >= self.max_age:
+                self.oldest = time.monotonic()  # one age-triggered flush per window
+                return True
+            return False
 
     def flush(self) -> List[Dict]:
         """
         Flush and return the current buffer contents.
         """
+        return self.flush_entries()[0]
+
+    def flush_entries(self) -> Tuple[List[Dict], List[Optional[int]]]:
+        """
+        Flush and return the buffer contents with their job store ids, to forget once they are saved.
+        """
         with self.lock:
-            to_flush = self.buffer[:]
+            to_flush, ids = self.buffer[:], self.entry_ids[:]
             self.buffer.clear()
-            return to_flush
+            self.entry_ids.clear()
+            return to_flush, ids
 
 
 class UnresolvedListingBuffer:
     """
-    Thread-safe buffer for batching unresolved listing IDs and their card HTML.
+    Thread-safe buffer for batching unresolved listing IDs and their card records.
     Used to check which listings exist in the DB.
     """
     def __init__(self, batch_size: int):
         self.batch_size = batch_size
         self.buffer: List[Tuple[str, object]] = []  # (listing_id, card)
+        self.entry_ids: List[Optional[int]] = []  # job store rows, when crash-resume is on
         self.lock = Lock()
 
     def add(self, listing_id: str, card: object) -> bool:
         """
         Add an unresolved listing. Returns True if buffer reached batch size.
         """
+        entry_id = job_store.buffer_add("unresolved", [listing_id, asdict(card)]) if job_store.enabled else None
         with self.lock:
             self.buffer.append((listing_id, card))
+            self.entry_ids.append(entry_id)
             return len(self.buffer) >= self.batch_size
 
     def flush(self) -> List[Tuple[str, object]]:
         """
         Flush and return the buffer contents.
         """
+        return self.flush_entries()[0]
+
+    def flush_entries(self) -> Tuple[List[Tuple[str, object]], List[Optional[int]]]:
+        """
+        Flush and return the buffer contents with their job store ids, to forget once they are queued.
+        """
         with self.lock:
-            to_flush = self.buffer[:]
+            to_flush, ids = self.buffer[:], self.entry_ids[:]
             self.buffer.clear()
-            return to_flush
+            self.entry_ids.clear()
+            return to_flush, ids
 
 
 class SharedState:
     """
     Container for shared mutable state across jobs.
+    seen_listing_ids maps each listing ID met on a results page this run to its scope ("local" wins).
     """
     def __init__(self, batch_size: int = 100):
-        self.seen_listing_ids: Set[str] = set()
+        self.seen_listing_ids: Dict[str, str] = {}
         self.seen_lock = Lock()
 
         self.listing_buffer = ListingBuffer(batch_size=batch_size)
@@ -126,13 +446,28 @@ class SharedState:
 
         self.dispatcher = None  # Will be assigned after initialization
         self.tracker = None  # Optional StatusTracker Instance
-        self.scope = None
         self.verifier_queue = None
+        self.backfill_queue = None
+        self.verify_after_pages = True  # sharded workers leave verification and backfill to the coordinator
+        self.verification_started = False
+        self.retry_budget = RetryBudget()
+
+    def add_seen_listing_id(self, listing_id: str, scope: str = "local") -> None:
+        with self.seen_lock:
+            if scope == "local" or listing_id not in self.seen_listing_ids:
+                self.seen_listing_ids[listing_id] = scope
 
-    def add_seen_listing_id(self, listing_id: str) -> None:
+    def was_seen(self, listing_id: str, scope: Optional[str] = None) -> bool:
         with self.seen_lock:
-            self.seen_listing_ids.add(listing_id)
+            seen_scope = self.seen_listing_ids.get(listing_id)
+            return seen_scope is not None and (scope is None or seen_scope == scope)
 
-    def was_seen(self, listing_id: str) -> bool:
+    def claim_verification(self) -> bool:
+        """
+        Returns True only for the first caller, so a run verifies at most once.
+        """
         with self.seen_lock:
-            return listing_id in self.seen_listing_ids
+            if self.verification_started:
+                return False
+            self.verification_started = True
+            return True
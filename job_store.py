@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import JOB_STORE_CONFIG
+from sqlite_connections import connect
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    Optional SQLite record of the run's jobs and buffered listings, so a crashed scrape can be resumed
+    with `main.py --resume`. Jobs that define to_record()/from_record() are written as pending when
+    enqueued, running when a worker takes them and done once their results are durable. Buffered
+    listings are stored until they are flushed to the DB or handed to a queued job.
+    Fetch jobs completed earlier the same day are skipped, keyed by their URL.
+    Every method is a no-op until enable() is called.
+    """
+    def __init__(self, path: str = JOB_STORE_CONFIG["path"]):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.conn is not None
+
+    def enable(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # One connection shared under self.lock; every write is a short transaction
+        self.conn = connect(self.path, check_same_thread=False)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            run_date TEXT,
+            job_type TEXT,
+            job_key TEXT,
+            args TEXT,
+            priority INTEGER,
+            status TEXT,
+            result TEXT,
+            updated_at TEXT
+        )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (job_key, run_date, status)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS buffered (
+            id INTEGER PRIMARY KEY,
+            buffer TEXT,
+            payload TEXT
+        )
+        """)
+        self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def _execute(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        with self.lock:
+            cur = self.conn.execute(sql, params)
+            self.conn.commit()
+            return cur
+
+    # --- run lifecycle ---
+
+    def start_fresh(self) -> None:
+        """
+        Drops unfinished work from earlier runs and completed jobs from previous days.
+        """
+        if not self.enabled:
+            return
+        self._execute("DELETE FROM jobs WHERE status IN (?, ?) OR run_date < ?",
+                      (PENDING, RUNNING, date.today().isoformat()))
+        self._execute("DELETE FROM buffered")
+
+    def take_unfinished(self) -> List[Tuple[str, Dict, int]]:
+        """
+        Returns (job_type, args, priority) for every pending or in-progress job and removes them;
+        they are recorded again as they are re-enqueued.
+        """
+        if not self.enabled:
+            return []
+        with self.lock:
+            rows = self.conn.execute("SELECT job_type, args, priority FROM jobs WHERE status IN (?, ?) ORDER BY id",
+                                     (PENDING, RUNNING)).fetchall()
+            self.conn.execute("DELETE FROM jobs WHERE status IN (?, ?)", (PENDING, RUNNING))
+            self.conn.commit()
+        return [(job_type, json.loads(args), priority) for job_type, args, priority in rows]
+
+    # --- jobs ---
+
+    def record(self, job, priority: int) -> None:
+        if not self.enabled or not hasattr(job, "to_record"):
+            return
+        now = datetime.now().isoformat(timespec="seconds")
+        store_id = getattr(job, "store_id", None)
+        if store_id is not None:
+            # Re-enqueued (deferred or released from backpressure): the current run no longer completes it
+            job.store_attempt = getattr(job, "store_attempt", 0) + 1
+            self._execute("UPDATE jobs SET status = ?, priority = ?, updated_at = ? WHERE id = ?",
+                          (PENDING, priority, now, store_id))
+            return
+        args = json.dumps(job.to_record(), default=str)
+        cur = self._execute(
+            "INSERT INTO jobs (run_date, job_type, job_key, args, priority, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (date.today().isoformat(), job.__class__.__name__, self._key(job), args, priority, PENDING, now))
+        job.store_id = cur.lastrowid
+
+    def _key(self, job) -> Optional[str]:
+        return job.build_url() if hasattr(job, "build_url") else None
+
+    def _set_status(self, job, status: str, result: Optional[Dict] = None) -> None:
+        store_id = getattr(job, "store_id", None)
+        if not self.enabled or store_id is None:
+            return
+        self._execute("UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ?",
+                      (status, json.dumps(result) if result is not None else None,
+                       datetime.now().isoformat(timespec="seconds"), store_id))
+
+    def mark_running(self, job) -> int:
+        """
+        Marks the job a worker just took as running. Returns the attempt token to pass to finish().
+        A ParseJob stands for the fetch it continues.
+        """
+        target = getattr(job, "fetch_job", job)
+        self._set_status(target, RUNNING)
+        return getattr(target, "store_attempt", 0)
+
+    def mark_pending(self, job) -> None:
+        job.store_attempt = getattr(job, "store_attempt", 0) + 1
+        self._set_status(job, PENDING)
+
+    def finish(self, job, attempt: int, failed: bool = False) -> None:
+        """
+        Marks a job done after a worker ran it, unless it was re-enqueued (deferred/parked) meanwhile
+        or its page is still waiting on the parse pool. A ParseJob completes the fetch it continues.
+        """
+        target = getattr(job, "fetch_job", job)
+        if target is job and getattr(job, "parse_pending", False):
+            return
+        if getattr(target, "store_attempt", 0) != attempt:
+            return
+        self._set_status(target, FAILED if failed else DONE, result=getattr(target, "store_result", None))
+
+    def completed_today(self, job) -> Optional[Dict]:
+        """
+        Returns the stored result ({} if none) of an identical fetch that finished today, else None.
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM jobs WHERE job_key = ? AND run_date = ? AND status = ? LIMIT 1",
+                (self._key(job), date.today().isoformat(), DONE)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]) if row[0] else {}
+
+    # --- buffers ---
+
+    def buffer_add(self, buffer: str, payload) -> Optional[int]:
+        if not self.enabled:
+            return None
+        cur = self._execute("INSERT INTO buffered (buffer, payload) VALUES (?, ?)",
+                            (buffer, json.dumps(payload, default=str)))
+        return cur.lastrowid
+
+    def forget_buffered(self, ids: List[Optional[int]]) -> None:
+        ids = [(entry_id,) for entry_id in ids if entry_id is not None]
+        if not self.enabled or not ids:
+            return
+        with self.lock:
+            self.conn.executemany("DELETE FROM buffered WHERE id = ?", ids)
+            self.conn.commit()
+
+    def take_buffered(self, buffer: str) -> List:
+        if not self.enabled:
+            return []
+        with self.lock:
+            rows = self.conn.execute("SELECT payload FROM buffered WHERE buffer = ? ORDER BY id", (buffer,)).fetchall()
+            self.conn.execute("DELETE FROM buffered WHERE buffer = ?", (buffer,))
+            self.conn.commit()
+        return [json.loads(payload) for payload, in rows]
+
+    def get_stats(self) -> Dict[str, int]:
+        if not self.enabled:
+            return {}
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs WHERE run_date = ? GROUP BY status",
+                                     (date.today().isoformat(),)).fetchall()
+        return dict(rows)
+
+
+job_store = JobStore()
@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+from config import DETAIL_BACKFILL_CONFIG
+from job import Job, FetchJob, ProducerJob, PrioritizedJobQueue, SharedState
+from db import get_pending_listings, backfill_pending_listing
+from listing_index import listing_index
+from utils.job_utils import enqueue_with_priority
+
+
+class DetailBackfillJob(ProducerJob):
+    """
+    Feeds BackfillDetailJobs for listings saved from card data only, up to the per-run backfill budget.
+    Pending listings come from the DB, so anything left over is picked up by a later run.
+    """
+    downstream = ("BackfillDetailJob",)
+
+    def __init__(self, shared_state: SharedState, limit: int = DETAIL_BACKFILL_CONFIG["max_per_run"]):
+        self.shared_state = shared_state
+        self.limit = limit
+
+    def pending(self) -> List[Tuple[str, str]]:
+        if self.shared_state.backfill_queue is None:
+            # Oldest first, since the backlog is consumed from the end
+            self.shared_state.backfill_queue = get_pending_listings(self.limit)[::-1]
+        return self.shared_state.backfill_queue
+
+    def make_job(self, item: Tuple[str, str]) -> 'BackfillDetailJob':
+        listing_id, url = item
+        return BackfillDetailJob(listing_id, url, self.shared_state)
+
+
+class BackfillDetailJob(FetchJob):
+    """
+    Scrapes the detail page of a card-only listing and swaps its placeholder VIN for the real one.
+    """
+    def __init__(self, listing_id: str, url: str, shared_state: SharedState):
+        self.listing_id = listing_id
+        self.url = url
+        self.shared_state = shared_state
+
+    def to_record(self) -> Dict:
+        return {"listing_id": self.listing_id, "url": self.url}
+
+    @classmethod
+    def from_record(cls, args: Dict, shared_state: SharedState) -> 'BackfillDetailJob':
+        return cls(args["listing_id"], args["url"], shared_state)
+
+    def build_url(self) -> str:
+        return self.url
+
+    def handle_failure(self, job_queue: PrioritizedJobQueue) -> None:
+        print(f"[BackfillDetailJob] Failed to fetch detail for {self.listing_id}; left pending")
+
+    def handle_parsed(self, fields: Dict, job_queue: PrioritizedJobQueue) -> None:
+        tracker = self.shared_state.tracker
+
+        if not fields["vin"]:
+            print(f"[BackfillDetailJob] No VIN on detail page for {self.listing_id}; left pending")
+            return
+
+        days_on_market = fields["days_on_market"]
+        enqueue_with_priority(job_queue, BackfillSaveJob(self.listing_id, {
+            "vin": fields["vin"],
+            "mileage": fields["mileage"],
+            "days_on_market": days_on_market,
+            "date_added": (date.today() - timedelta(days=days_on_market)) if days_on_market else None,
+            "msrp": fields["msrp"],
+            "status": "active" if fields["active"] else "inactive",
+        }, self.shared_state))
+        tracker.record_complete(self.__class__.__name__)
+
+
+class BackfillSaveJob(Job):
+    """
+    Writes a backfilled listing's real VIN and detail fields to the DB (on the db_write pool).
+    """
+    def __init__(self, listing_id: str, details: Dict, shared_state: SharedState):
+        self.listing_id = listing_id
+        self.details = details
+        self.shared_state = shared_state
+
+    def to_record(self) -> Dict:
+        return {"listing_id": self.listing_id, "details": self.details}
+
+    @classmethod
+    def from_record(cls, args: Dict, shared_state: SharedState) -> 'BackfillSaveJob':
+        return cls(args["listing_id"], args["details"], shared_state)
+
+    def run(self, job_queue: PrioritizedJobQueue) -> None:
+        tracker = self.shared_state.tracker
+        tracker.record_start(self.__class__.__name__)
+        backfill_pending_listing(self.listing_id, self.details)
+        listing_index.put(self.listing_id, self.details["vin"])
+        tracker.record_complete(self.__class__.__name__)
@@ -1,33 +1,106 @@
+from threading import Lock
+from typing import Dict, Tuple
+from config import DETAIL_BACKFILL_CONFIG, SEARCH_CONFIG
 from job import PrioritizedJobQueue, SharedState
+from jobs.detail_backfill import DetailBackfillJob
+from job_store import job_store
 from jobs.listing_resolution import ListingIDResolutionJob
 from jobs.verifier import VerifierJob
 from utils.job_utils import enqueue_with_priority
+from utils.card_record import CardRecord
 
 
 class Dispatcher:
     """
-    Coordinates flushing unresolved listings and triggering verification jobs
-    once all pages have been processed.
+    Run-level coordinator for the results-page phase. Keeps a page countdown per (models, scope)
+    group; once seal() has been called and every group reaches zero, it flushes the remaining
+    unresolved listings and starts verification (and the card-only backfill) exactly once, while
+    detail scrapes are still running.
     """
-    def __init__(self, job_queue: PrioritizedJobQueue, shared_state: SharedState, total_pages: int):
+    def __init__(self, job_queue: PrioritizedJobQueue, shared_state: SharedState):
         self.job_queue = job_queue
         self.shared_state = shared_state
-        self.remaining_pages = total_pages
-        self.lock = shared_state.seen_lock  # reuse lock to guard page countdown
+        self.remaining_pages: Dict[Tuple, int] = {}
+        self.admitted_cards: Dict[str, CardRecord] = {}
+        self.sealed = False
+        self.finished = False
+        self.lock = Lock()
 
-    def add_unresolved_listing(self, listing_id: str, card: object) -> None:
+    def admit_card(self, card: CardRecord) -> bool:
+        """
+        Records a results-page card as seen this run. With prioritize_local_first, each listing is
+        processed once per run, whichever scope's page is parsed first; a later local card for it is
+        dropped but upgrades the admitted card, so the listing is still saved as "local".
+        """
+        scope = card.search_scope or "local"
+        self.shared_state.add_seen_listing_id(card.listing_id, scope)
+        if not SEARCH_CONFIG["prioritize_local_first"]:
+            return True
+        with self.lock:
+            admitted = self.admitted_cards.setdefault(card.listing_id, card)
+            if admitted is card:
+                return True
+            if scope == "local":
+                admitted.search_scope = "local"
+            return False
+
+    def add_unresolved_listing(self, listing_id: str, card: CardRecord) -> None:
+        if not self.admit_card(card):
+            return
         should_flush = self.shared_state.unresolved_buffer.add(listing_id, card)
         if should_flush:
-            unresolved_batch = self.shared_state.unresolved_buffer.flush()
+            unresolved_batch, entry_ids = self.shared_state.unresolved_buffer.flush_entries()
             enqueue_with_priority(self.job_queue, ListingIDResolutionJob(unresolved_batch, self.shared_state))
+            job_store.forget_buffered(entry_ids)
+
+    def expect_pages(self, group: Tuple, count: int) -> None:
+        """
+        Adds pages to a group's countdown, at seeding time or when pagination schedules more.
+        """
+        with self.lock:
+            self.remaining_pages[group] = self.remaining_pages.get(group, 0) + count
+
+    def seal(self) -> None:
+        """
+        Marks seeding complete. Until then the page phase can't finish, even if every count is zero.
+        """
+        with self.lock:
+            self.sealed = True
+            done = self._claim_finish()
+        if done:
+            self.finish_pages()
 
-    def notify_page_complete(self) -> None:
+    def notify_page_complete(self, group: Tuple) -> None:
         with self.lock:
-            self.remaining_pages -= 1
-            if self.remaining_pages == 0:
-                # Final flush of any unresolved listings
-                final_batch = self.shared_state.unresolved_buffer.flush()
-                if final_batch:
-                    enqueue_with_priority(self.job_queue, ListingIDResolutionJob(final_batch, self.shared_state))
-
-                enqueue_with_priority(self.job_queue, VerifierJob(self.shared_state))
+            self.remaining_pages[group] -= 1
+            group_done = self.remaining_pages[group] == 0
+            done = self._claim_finish()
+        if group_done:
+            print(f"[Dispatcher] Result pages done for {' '.join(group[0])} ({group[1]})")
+        if done:
+            self.finish_pages()
+
+    def _claim_finish(self) -> bool:
+        if self.finished or not self.sealed or any(self.remaining_pages.values()):
+            return False
+        self.finished = True
+        return True
+
+    def get_progress(self) -> Dict[Tuple, int]:
+        with self.lock:
+            return dict(self.remaining_pages)
+
+    def finish_pages(self) -> None:
+        # Final flush of any unresolved listings
+        final_batch, entry_ids = self.shared_state.unresolved_buffer.flush_entries()
+        if final_batch:
+            enqueue_with_priority(self.job_queue, ListingIDResolutionJob(final_batch, self.shared_state))
+        job_store.forget_buffered(entry_ids)
+
+        # Sharded workers leave both to the coordinator, which runs them once for the whole run
+        if not self.shared_state.verify_after_pages:
+            return
+
+        enqueue_with_priority(self.job_queue, VerifierJob(self.shared_state))
+        if DETAIL_BACKFILL_CONFIG["card_only"] and DETAIL_BACKFILL_CONFIG["backfill_in_run"]:
+            enqueue_with_priority(self.job_queue, DetailBackfillJob(self.shared_state))
@@ -1,41 +1,71 @@
-from typing import List, Tuple
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
 from job import Job, PrioritizedJobQueue, SharedState
-from db import get_vins_by_listing_ids
-from jobs.card_processing import SaveJob, DetailScrapeJob  # SaveJob submits listings to the batch buffer
-from bs4 import Tag
-from utils.soup_helpers import extract_price
+from config import DETAIL_BACKFILL_CONFIG
+from db import get_vins_by_listing_ids, pending_vin
+from listing_index import listing_index
+from jobs.card_processing import SaveJob, DetailScrapeJob, listing_from_card  # SaveJob submits listings to the batch buffer
+from utils.card_record import CardRecord
 from utils.job_utils import enqueue_with_priority
+from backpressure import backpressure
 
 
 class ListingIDResolutionJob(Job):
     """
     Resolves whether listings exist in the DB and queues DetailScrapeJobs or SaveJobs accordingly.
+    In card-only mode new listings are saved straight from the card under a pending VIN.
+    Waits (parked) while detail scrapes or saves are backed up.
+    existing_map can be passed when the caller already looked the IDs up (delta mode).
     """
-    def __init__(self, batch: List[Tuple[str, Tag]], shared_state: SharedState):
+    downstream = ("DetailScrapeJob", "SaveJob")
+
+    def __init__(self, batch: List[Tuple[str, CardRecord]], shared_state: SharedState,
+                 existing_map: Optional[Dict[str, str]] = None):
         self.batch = batch  # List of (listing_id, card)
         self.shared_state = shared_state
+        self.existing_map = existing_map
+
+    def to_record(self) -> Dict:
+        return {
+            "batch": [[listing_id, asdict(card)] for listing_id, card in self.batch],
+            "existing_map": self.existing_map,
+        }
+
+    @classmethod
+    def from_record(cls, args: Dict, shared_state: SharedState) -> 'ListingIDResolutionJob':
+        return cls([(listing_id, CardRecord(**card)) for listing_id, card in args["batch"]], shared_state,
+                   args.get("existing_map"))
 
     def run(self, job_queue: PrioritizedJobQueue) -> None:
+        if backpressure.park(self, job_queue, self.downstream):
+            return
+
         tracker = self.shared_state.tracker
         tracker.record_start(self.__class__.__name__)
 
         listing_ids = [listing_id for listing_id, _ in self.batch]
-        existing_map = get_vins_by_listing_ids(listing_ids)  # {listing_id: vin}
+        existing_map = self.existing_map
+        if existing_map is None:
+            existing_map = listing_index.lookup(listing_ids)
+        if existing_map is None:
+            existing_map = get_vins_by_listing_ids(listing_ids)  # {listing_id: vin}
 
         for listing_id, card in self.batch:
-            self.shared_state.add_seen_listing_id(listing_id)
-
             if listing_id in existing_map:
-                price = extract_price(card)
+                price = card.price
 
                 enqueue_with_priority(job_queue, SaveJob({
                     "vin": existing_map[listing_id],
                     "listing_id": listing_id,
                     "price": price,
-                    "search_scope": self.shared_state.scope,
+                    "search_scope": card.search_scope,
                     "distance": None,
                     "shipping_cost": None,
                 }, self.shared_state))
+            elif DETAIL_BACKFILL_CONFIG["card_only"]:
+                listing = listing_from_card(listing_id, card)
+                listing["vin"] = pending_vin(listing_id)
+                enqueue_with_priority(job_queue, SaveJob(listing, self.shared_state))
             else:
                 enqueue_with_priority(job_queue, DetailScrapeJob(listing_id, card, shared_state=self.shared_state))
 
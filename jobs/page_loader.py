@@ -1,16 +1,31 @@
-from typing import List
-from job import Job, PrioritizedJobQueue, SharedState
-from page_fetcher import fetch_soup_with_fallback
-from config import BASE_URL, PAGE_SIZE
+import math
+from typing import Dict, List, Optional, Tuple
+from job import FetchJob, PrioritizedJobQueue, SharedState
+from config import BASE_URL, PAGE_SIZE, DELTA_CONFIG, SEARCH_CONFIG
+from db import get_vins_by_listing_ids
+from listing_index import listing_index
 from urllib.parse import urlencode
+from utils.job_utils import enqueue_with_priority
+from utils.card_record import CardRecord
+from job_store import job_store
+from jobs.listing_resolution import ListingIDResolutionJob
 
 
-class PageLoadJob(Job):
+class PageLoadJob(FetchJob):
     """
     Job to load a specific results page, extract vehicle cards, and enqueue them for ID resolution.
+    A lead page also reads the total result count and schedules the remaining pages up to last_page.
+    Waits (parked) while the jobs its cards turn into are backed up. With the job store on, pages
+    already completed today are skipped.
+    In delta mode pages are sorted newest-first and loaded one after another; paging stops once a
+    page is made up almost entirely of listings already in the DB.
     """
+    page_kind = "results"
+    downstream = ("ParseJob", "ListingIDResolutionJob", "DetailScrapeJob", "SaveJob")
+
     def __init__(self, page_num: int, makes: List[str], models: List[str], scope: str, zip_code: str, radius: int,
-                 shared_state: SharedState):
+                 shared_state: SharedState, last_page: Optional[int] = None, lead: bool = False,
+                 delta: Optional[bool] = None):
         self.page_num = page_num
         self.makes = makes
         self.models = models
@@ -18,11 +33,40 @@ class PageLoadJob(Job):
         self.zip_code = zip_code
         self.radius = radius
         self.shared_state = shared_state
+        self.last_page = last_page if last_page is not None else page_num
+        self.lead = lead
+        self.delta = DELTA_CONFIG["enabled"] if delta is None else delta
 
-    def run(self, job_queue: PrioritizedJobQueue) -> None:
-        tracker = self.shared_state.tracker
-        tracker.record_start(self.__class__.__name__)
+    @property
+    def group(self) -> Tuple[Tuple[str, ...], str]:
+        """
+        The (models, scope) page countdown this page belongs to in the Dispatcher.
+        """
+        return tuple(self.models), self.scope
+
+    @property
+    def priority_offset(self) -> int:
+        # National pages queue behind local ones so their duplicates can be dropped
+        return 1 if self.scope == "national" and SEARCH_CONFIG["prioritize_local_first"] else 0
+
+    def to_record(self) -> Dict:
+        return {
+            "page_num": self.page_num,
+            "makes": self.makes,
+            "models": self.models,
+            "scope": self.scope,
+            "zip_code": self.zip_code,
+            "radius": self.radius,
+            "last_page": self.last_page,
+            "lead": self.lead,
+            "delta": self.delta,
+        }
+
+    @classmethod
+    def from_record(cls, args: Dict, shared_state: SharedState) -> 'PageLoadJob':
+        return cls(shared_state=shared_state, **args)
 
+    def build_url(self) -> str:
         params = {
             "makes[]": self.makes,
             "models[]": self.models,
@@ -32,19 +76,120 @@ class PageLoadJob(Job):
             "page_size": PAGE_SIZE,
             "maximum_distance": self.radius if self.scope == "local" else "all"
         }
-        url = BASE_URL + "?" + urlencode(params, doseq=True)
-        soup, _ = fetch_soup_with_fallback(url)
+        if self.delta:
+            params["sort"] = DELTA_CONFIG["sort"]
+        return BASE_URL + "?" + urlencode(params, doseq=True)
 
-        if not soup:
-            print(f"[PageLoadJob] Failed to fetch page {self.page_num}")
-            self.shared_state.dispatcher.notify_page_complete()
+    def admit(self, job_queue: PrioritizedJobQueue) -> bool:
+        completed = job_store.completed_today(self)
+        if completed is not None:
+            if self.delta:
+                # Replay the stop decision made when this page was first loaded
+                self.last_page = min(self.last_page, completed.get("final_page", self.last_page))
+                if not completed.get("delta_stop"):
+                    self.schedule_pages_through(self.page_num + 1, job_queue)
+            elif self.lead:
+                self.schedule_pages_through(completed.get("final_page", self.last_page), job_queue)
+            self.store_result = completed
+            self.shared_state.dispatcher.notify_page_complete(self.group)
+            return False
+        return True
+
+    def follow_up(self, page_num: int) -> 'PageLoadJob':
+        return PageLoadJob(
+            page_num=page_num,
+            makes=self.makes,
+            models=self.models,
+            scope=self.scope,
+            zip_code=self.zip_code,
+            radius=self.radius,
+            shared_state=self.shared_state,
+            last_page=self.last_page,
+            delta=self.delta,
+        )
+
+    def schedule_pages_through(self, final_page: int, job_queue: PrioritizedJobQueue) -> None:
+        """
+        Enqueues pages after this one up to final_page (capped at last_page) and extends the page countdown.
+        """
+        pages = range(self.page_num + 1, min(final_page, self.last_page) + 1)
+        if not pages:
             return
+        self.shared_state.dispatcher.expect_pages(self.group, len(pages))
+        for page_num in pages:
+            enqueue_with_priority(job_queue, self.follow_up(page_num))
+
+    def pages_needed(self, total_results: Optional[int], card_count: int) -> int:
+        if total_results is not None:
+            return math.ceil(total_results / PAGE_SIZE)
+        if card_count < PAGE_SIZE:
+            return self.page_num
+        return self.last_page
+
+    def handle_failure(self, job_queue: PrioritizedJobQueue) -> None:
+        print(f"[PageLoadJob] Failed to fetch page {self.page_num}")
+        if self.delta:
+            # Can't tell whether this page was all known listings, so keep going
+            self.schedule_pages_through(self.page_num + 1, job_queue)
+        elif self.lead:
+            # Without a result count, fall back to scheduling the full page range
+            self.schedule_pages_through(self.last_page, job_queue)
+        self.shared_state.dispatcher.notify_page_complete(self.group)
+
+    def handle_skipped(self, job_queue: PrioritizedJobQueue) -> None:
+        self.shared_state.dispatcher.notify_page_complete(self.group)
+
+    def card_records(self, fields: Dict) -> List[CardRecord]:
+        return [CardRecord(**dict(card, search_scope=self.scope)) for card in fields["cards"]]
+
+    def handle_delta_page(self, fields: Dict, job_queue: PrioritizedJobQueue) -> None:
+        """
+        Resolves this page's cards in one lookup and schedules the next page only while the page
+        still has enough unknown listings.
+        """
+        result = {}
+        if self.lead:
+            final_page = self.pages_needed(fields["total_results"], fields["card_count"])
+            result["final_page"] = final_page
+            self.last_page = min(self.last_page, final_page)
+
+        records = self.card_records(fields)
+        listing_ids = [record.listing_id for record in records]
+        existing_map = listing_index.lookup(listing_ids)
+        if existing_map is None:
+            existing_map = get_vins_by_listing_ids(listing_ids) if records else {}
+        known_ratio = len(existing_map) / len(records) if records else 1.0
+
+        result["delta_stop"] = known_ratio >= DELTA_CONFIG["stop_known_ratio"] or fields["card_count"] < PAGE_SIZE
+        # Stored so a resumed run stops at the same page
+        self.store_result = result
+        if not result["delta_stop"]:
+            self.schedule_pages_through(self.page_num + 1, job_queue)
+        else:
+            print(f"[PageLoadJob] Delta stop for {self.models} {self.scope} at page {self.page_num} "
+                  f"({known_ratio:.0%} known)")
+
+        dispatcher = self.shared_state.dispatcher
+        batch = [(record.listing_id, record) for record in records if dispatcher.admit_card(record)]
+        if batch:
+            enqueue_with_priority(job_queue, ListingIDResolutionJob(batch, self.shared_state, existing_map))
+
+    def handle_parsed(self, fields: Dict, job_queue: PrioritizedJobQueue) -> None:
+        tracker = self.shared_state.tracker
+
+        if self.delta:
+            self.handle_delta_page(fields, job_queue)
+            self.shared_state.dispatcher.notify_page_complete(self.group)
+            tracker.record_complete(self.__class__.__name__)
+            return
+
+        if self.lead:
+            final_page = self.pages_needed(fields["total_results"], fields["card_count"])
+            self.store_result = {"final_page": final_page}
+            self.schedule_pages_through(final_page, job_queue)
 
-        cards = soup.select("div.vehicle-card")
-        for card in cards:
-            listing_id = card.get("data-listing-id")
-            if listing_id:
-                self.shared_state.dispatcher.add_unresolved_listing(listing_id, card)
+        for record in self.card_records(fields):
+            self.shared_state.dispatcher.add_unresolved_listing(record.listing_id, record)
 
-        self.shared_state.dispatcher.notify_page_complete()
+        self.shared_state.dispatcher.notify_page_complete(self.group)
         tracker.record_complete(self.__class__.__name__)
@@ -1,26 +1,39 @@
 from datetime import date
-from config import ENQUEUE_BATCH_SIZE
-from job import Job, PrioritizedJobQueue, SharedState
-from db import get_all_active_listing_ids
+from itertools import islice
+from typing import Dict, List, Tuple
+from config import VERIFIER_CONFIG
+from job import Job, FetchJob, ProducerJob, PrioritizedJobQueue, SharedState
+from db import get_verification_candidates
 from jobs.card_processing import SaveJob
 from utils.job_utils import enqueue_with_priority
 
 
 class VerifierJob(Job):
     """
-    Compares active listings in DB that haven't been seen today and queues
-    verification detail scrapes for each.
+    Picks the active listings in DB that haven't been seen today, highest verification score first,
+    and queues verification detail scrapes for up to max_per_run of them; the rest roll over to the
+    next run. Runs at most once per run, and skips listings already met on this run's result pages
+    (their saves may still be buffered).
     """
-    def __init__(self, shared_state: SharedState, today: date = date.today()):
+    def __init__(self, shared_state: SharedState, today: date = date.today(),
+                 budget: int = VERIFIER_CONFIG["max_per_run"]):
         self.shared_state = shared_state
         self.today = today
+        self.budget = budget
 
     def run(self, job_queue: PrioritizedJobQueue) -> None:
         tracker = self.shared_state.tracker
+        if not self.shared_state.claim_verification():
+            print("[VerifierJob] Verification already started this run, skipping")
+            return
         tracker.record_start(self.__class__.__name__)
 
-        stale_listings = get_all_active_listing_ids(today=self.today)
-        self.shared_state.verifier_queue = stale_listings
+        candidates = ((vin, url) for vin, url, listing_id in get_verification_candidates(today=self.today)
+                      if not self.shared_state.was_seen(listing_id))
+        stale_listings = list(islice(candidates, self.budget))
+        print(f"[VerifierJob] Verifying {len(stale_listings)} listings (budget {self.budget})")
+        # The producer pops from the end, so the best-scored listing goes last
+        self.shared_state.verifier_queue = stale_listings[::-1]
 
         # Add one job that will start feeding the details
         enqueue_with_priority(job_queue, VerifierProducerJob(self.shared_state))
@@ -28,38 +41,35 @@ class VerifierJob(Job):
         tracker.record_complete(self.__class__.__name__)
 
 
-class VerifyDetailJob(Job):
+class VerifyDetailJob(FetchJob):
     """
     Performs a detail scrape using just the VIN + URL to see if a previously active listing is still valid.
     If the listing is inactive, it updates the DB to mark it as such.
     If active, it updates last_seen and optionally price.
+    Not recorded in the job store: a resumed run's VerifierJob picks the still-unverified listings
+    again, and resuming these as well would verify them twice.
     """
     def __init__(self, vin: str, url: str, shared_state: SharedState):
         self.vin = vin
         self.url = url
         self.shared_state = shared_state
 
-    def run(self, job_queue: PrioritizedJobQueue) -> None:
-        from page_fetcher import fetch_soup_with_fallback
-        from utils.soup_helpers import check_listing_still_active, extract_price
-        from datetime import date
+    def build_url(self) -> str:
+        return self.url
 
-        tracker = self.shared_state.tracker
-        tracker.record_start(self.__class__.__name__)
+    def handle_failure(self, job_queue: PrioritizedJobQueue) -> None:
+        print(f"[VerifyDetailJob] {self.vin} — error during fetch.")
 
+    def handle_parsed(self, fields: Dict, job_queue: PrioritizedJobQueue) -> None:
+        tracker = self.shared_state.tracker
         today = date.today()
-        soup, request_type = fetch_soup_with_fallback(self.url, 10)
 
-        if soup is None:
-            print(f"[VerifyDetailJob] {self.vin} — error during fetch.")
-            return
-
-        if not check_listing_still_active(soup):
+        if not fields["active"]:
             listing = {"vin": self.vin, "status": "inactive"}
             enqueue_with_priority(job_queue, SaveJob(listing, self.shared_state))
             return
 
-        price = extract_price(soup)
+        price = fields["price"]
         listing = {
             "vin": self.vin,
             "last_seen": today,
@@ -71,30 +81,18 @@ class VerifyDetailJob(Job):
         tracker.record_complete(self.__class__.__name__)
 
 
-class VerifierProducerJob(Job):
+class VerifierProducerJob(ProducerJob):
+    """
+    Feeds VerifyDetailJobs from the stale listings VerifierJob collected.
+    """
+    downstream = ("VerifyDetailJob",)
+
     def __init__(self, shared_state: SharedState):
         self.shared_state = shared_state
 
-    def run(self, job_queue: PrioritizedJobQueue) -> None:
-
-        tracker = self.shared_state.tracker
-        tracker.record_start(self.__class__.__name__)
-
-        try:
-            listings = self.shared_state.verifier_queue
-        except AttributeError:
-            print("[VerifierProducerJob] No verifier_queue found.")
-            return
-
-        # Pull off a chunk and enqueue detail jobs
-        for _ in range(min(ENQUEUE_BATCH_SIZE, len(listings))):
-            vin, url = listings.pop()
-            enqueue_with_priority(job_queue, VerifyDetailJob(vin, url, self.shared_state))
-            tracker.record_complete(self.__class__.__name__)
-
-        # If there's still more work to do, enqueue another round
-        if listings:
-            enqueue_with_priority(job_queue, VerifierProducerJob(self.shared_state))
-
-        tracker.record_complete(self.__class__.__name__)
+    def pending(self) -> List[Tuple[str, str]]:
+        return self.shared_state.verifier_queue or []
 
+    def make_job(self, item: Tuple[str, str]) -> VerifyDetailJob:
+        vin, url = item
+        return VerifyDetailJob(vin, url, self.shared_state)
@@ -0,0 +1,53 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from db import get_listing_index
+
+
+class ListingIndex:
+    """
+    In-memory listing_id -> VIN map of everything in the listings table. Loaded once at startup and
+    kept current as listings are saved, so ID resolution needs no SQLite query. Before load() is
+    called, lookup() returns None and callers fall back to the DB.
+    """
+    def __init__(self):
+        self.vins: Optional[Dict[str, str]] = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.vins is not None
+
+    def load(self) -> int:
+        vins = get_listing_index()
+        with self.lock:
+            self.vins = vins
+        return len(vins)
+
+    def lookup(self, listing_ids: Iterable[str]) -> Optional[Dict[str, str]]:
+        """
+        Returns {listing_id: vin} for the known IDs, or None if the index isn't loaded.
+        """
+        with self.lock:
+            if self.vins is None:
+                return None
+            return {listing_id: self.vins[listing_id] for listing_id in listing_ids if listing_id in self.vins}
+
+    def put(self, listing_id: str, vin: str) -> None:
+        with self.lock:
+            if self.vins is not None:
+                self.vins[listing_id] = vin
+
+    def add_saved(self, listings: List[Dict]) -> None:
+        """
+        Records listings just written by flush_listings_to_db.
+        """
+        with self.lock:
+            if self.vins is None:
+                return
+            for listing in listings:
+                if listing.get("listing_id") and listing.get("vin"):
+                    self.vins[listing["listing_id"]] = listing["vin"]
+
+
+listing_index = ListingIndex()
@@ -1,68 +1,304 @@
-from job import PrioritizedJobQueue, Worker, SharedState, StopJob
+import argparse
+
+from job import SharedState
 from jobs.dispatcher import Dispatcher
 from jobs.page_loader import PageLoadJob
-from config import SEARCH_CONFIG
-from db import init_db
+from jobs.detail_backfill import DetailBackfillJob, BackfillDetailJob, BackfillSaveJob
+from jobs.card_processing import SaveJob, DetailScrapeJob, flush_save_buffer
+from jobs.verifier import VerifierJob
+from jobs.listing_resolution import ListingIDResolutionJob
+from config import SEARCH_CONFIG, EXECUTION_ENGINE, ASYNC_CONFIG, HTML_PARSER, DETAIL_BACKFILL_CONFIG, JOB_STORE_CONFIG, DELTA_CONFIG, RUN_DEADLINE_CONFIG
+from db import init_db, db_connections
 from status_tracker import StatusTracker
 from utils.job_utils import enqueue_with_priority
+from http_pool import session_pool, pool_stats
+from rate_limiter import rate_scheduler
+from user_agent_tracking import ua_registry
+from browser_pool import browser_pool
+from response_cache import response_cache
+from fetch_policy import circuit_breaker
+from utils.html_parser import configure_parser
+from parse_pool import parse_pool
+from worker_pools import WorkerPools
+from backpressure import backpressure
+from job_store import job_store
+from listing_index import listing_index
+from run_deadline import run_deadline
+from utils.card_record import CardRecord
+from sharding import WorkUnit, WorkUnitStore, plan_units, run_worker, spawn_workers, wait_for_run, default_run_id
 
-
-NUM_WORKERS = 32
+# Job classes the job store can rebuild on --resume
+RESUMABLE_JOBS = {cls.__name__: cls for cls in (
+    PageLoadJob, ListingIDResolutionJob, DetailScrapeJob, SaveJob, BackfillDetailJob, BackfillSaveJob
+)}
 
 
-def main():
-    init_db()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape cars.com listings into the local database.")
+    parser.add_argument("--engine", choices=["threads", "async"], default=EXECUTION_ENGINE,
+                        help="Run jobs on the threaded Worker pool or the asyncio fetch engine.")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONFIG["concurrency"],
+                        help="Maximum in-flight requests for the asyncio engine.")
+    parser.add_argument("--parser", choices=["auto", "lxml", "bs4-lxml", "html.parser"], default=HTML_PARSER,
+                        help="HTML parser backend used for results and detail pages.")
+    parser.add_argument("--cache", choices=["normal", "replay", "off"], default=response_cache.mode,
+                        help="Response cache mode; 'replay' serves pages only from data/http_cache with no network.")
+    parser.add_argument("--card-only", action="store_true", default=DETAIL_BACKFILL_CONFIG["card_only"],
+                        help="Save new listings from search-card data and backfill detail pages afterwards.")
+    parser.add_argument("--backfill-only", action="store_true",
+                        help="Skip searching and only backfill detail pages for card-only listings.")
+    parser.add_argument("--delta", action="store_true", default=DELTA_CONFIG["enabled"],
+                        help="Page newest-first and stop each model/scope once pages are mostly known listings.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the unfinished jobs and buffered listings of a crashed run from data/job_store.db.")
+    parser.add_argument("--max-runtime", type=float, default=RUN_DEADLINE_CONFIG["max_runtime_minutes"],
+                        metavar="MINUTES",
+                        help="Stop starting new fetches near this limit, save what was fetched and exit.")
+    parser.add_argument("--coordinator", action="store_true",
+                        help="Split the run into (model, scope, page range) units for --worker processes, then verify.")
+    parser.add_argument("--worker", action="store_true",
+                        help="Lease and scrape work units of a coordinated run until none are left.")
+    parser.add_argument("--spawn", type=int, default=0,
+                        help="With --coordinator, start this many local worker processes.")
+    parser.add_argument("--run-id", default=default_run_id(),
+                        help="Sharded run to plan or join (defaults to today's date).")
+    return parser.parse_args()
 
-    shared_state = SharedState(batch_size=200)
-    tracker = StatusTracker()
-    shared_state.tracker = tracker
-
-    tracker.start_loop()
-
-    job_queue = PrioritizedJobQueue()
-    workers = [Worker(job_queue) for _ in range(NUM_WORKERS)]
-    for w in workers:
-        w.start()
 
+def seed_page_jobs(job_queue, shared_state: SharedState) -> None:
     zip_code = SEARCH_CONFIG["zip"]
     radius = SEARCH_CONFIG["radius"]
     total_pages = SEARCH_CONFIG["pages"]
     models = SEARCH_CONFIG["models"]
+    adaptive = SEARCH_CONFIG["adaptive_pagination"]
+
+    # Adaptive runs seed only page 1 per scope; it schedules the rest once the result count is known.
+    # Delta runs also start from page 1 and chain one page at a time
+    seeded_pages = range(1, 2) if adaptive or DELTA_CONFIG["enabled"] else range(1, total_pages + 1)
+
+    # One dispatcher for the whole run: every model and scope counts down, then it verifies once
+    shared_state.dispatcher = Dispatcher(job_queue, shared_state)
+    jobs = [
+        PageLoadJob(
+            page_num=page_num,
+            makes=[entry["make"]],
+            models=[entry["model"]],
+            scope=scope,
+            zip_code=zip_code,
+            radius=radius,
+            shared_state=shared_state,
+            last_page=total_pages,
+            lead=adaptive
+        )
+        for entry in models
+        for page_num in seeded_pages
+        for scope in ("local", "national")
+    ]
+    for job in jobs:
+        shared_state.dispatcher.expect_pages(job.group, 1)
+    for job in jobs:
+        enqueue_with_priority(job_queue, job)
+    shared_state.dispatcher.seal()
+
+
+def seed_unit_jobs(job_queue, shared_state: SharedState, unit: WorkUnit) -> None:
+    """
+    Seeds one sharded work unit: a single model and scope, limited to the unit's page range.
+    """
+    adaptive = SEARCH_CONFIG["adaptive_pagination"]
+    if adaptive or DELTA_CONFIG["enabled"]:
+        seeded_pages = range(unit.first_page, unit.first_page + 1)
+    else:
+        seeded_pages = range(unit.first_page, unit.last_page + 1)
+    shared_state.dispatcher = Dispatcher(job_queue, shared_state)
+    jobs = [
+        PageLoadJob(
+            page_num=page_num,
+            makes=[unit.make],
+            models=[unit.model],
+            scope=unit.scope,
+            zip_code=SEARCH_CONFIG["zip"],
+            radius=SEARCH_CONFIG["radius"],
+            shared_state=shared_state,
+            last_page=unit.last_page,
+            lead=adaptive
+        )
+        for page_num in seeded_pages
+    ]
+    for job in jobs:
+        shared_state.dispatcher.expect_pages(job.group, 1)
+    for job in jobs:
+        enqueue_with_priority(job_queue, job)
+    shared_state.dispatcher.seal()
 
-    for entry in models:
-        make = entry["make"]
-        model = entry["model"]
-        shared_state.dispatcher = Dispatcher(job_queue, shared_state, total_pages)
-
-        for page_num in range(1, total_pages + 1):
-            enqueue_with_priority(job_queue, PageLoadJob(
-                page_num=page_num,
-                makes=[make],
-                models=[model],
-                scope="local",
-                zip_code=zip_code,
-                radius=radius,
-                shared_state=shared_state
-            ))
-
-            enqueue_with_priority(job_queue, PageLoadJob(
-                page_num=page_num,
-                makes=[make],
-                models=[model],
-                scope="national",
-                zip_code=zip_code,
-                radius=radius,
-                shared_state=shared_state
-            ))
+
+def seed_verifier_jobs(job_queue, shared_state: SharedState) -> None:
+    enqueue_with_priority(job_queue, VerifierJob(shared_state))
+    if DETAIL_BACKFILL_CONFIG["card_only"] and DETAIL_BACKFILL_CONFIG["backfill_in_run"]:
+        enqueue_with_priority(job_queue, DetailBackfillJob(shared_state))
+
+
+def seed_backfill_jobs(job_queue, shared_state: SharedState) -> None:
+    enqueue_with_priority(job_queue, DetailBackfillJob(shared_state))
+
+
+def resume_jobs(job_queue, shared_state: SharedState) -> None:
+    """
+    Re-enqueues the unfinished jobs and buffered listings recorded by the job store.
+    """
+    unfinished = job_store.take_unfinished()
+    shared_state.dispatcher = Dispatcher(job_queue, shared_state)
+    # Job types no longer resumable (e.g. VerifyDetailJobs from an older store) are rebuilt by this run
+    jobs = [(RESUMABLE_JOBS[job_type].from_record(args, shared_state), priority)
+            for job_type, args, priority in unfinished if job_type in RESUMABLE_JOBS]
+    pages = [job for job, _ in jobs if isinstance(job, PageLoadJob)]
+    for job in pages:
+        shared_state.dispatcher.expect_pages(job.group, 1)
+
+    for job, priority in jobs:
+        enqueue_with_priority(job_queue, job, priority)
+    for listing in job_store.take_buffered("listings"):
+        enqueue_with_priority(job_queue, SaveJob(listing, shared_state))
+    for listing_id, card in job_store.take_buffered("unresolved"):
+        shared_state.dispatcher.add_unresolved_listing(listing_id, CardRecord(**card))
+
+    print(f"[job store] resuming {len(unfinished)} jobs ({len(pages)} result pages)")
+    shared_state.dispatcher.seal()
+
+
+def run_threaded(shared_state: SharedState, seed) -> None:
+    job_queue = WorkerPools()
+    shared_state.tracker.pools = job_queue
+    job_queue.start()
+
+    seed(job_queue, shared_state)
 
     job_queue.join()
+    job_queue.stop()
+
+
+def run_async(shared_state: SharedState, seed, concurrency: int) -> None:
+    from async_engine import AsyncEngine
+
+    engine = AsyncEngine(concurrency=concurrency)
+    engine.run(lambda job_queue: seed(job_queue, shared_state))
+
+
+def run_engine(args, shared_state: SharedState, seed) -> None:
+    if args.engine == "async":
+        run_async(shared_state, seed, args.concurrency)
+    else:
+        run_threaded(shared_state, seed)
+
+
+def seed_unresolved_jobs(job_queue, shared_state: SharedState) -> None:
+    unresolved, entry_ids = shared_state.unresolved_buffer.flush_entries()
+    enqueue_with_priority(job_queue, ListingIDResolutionJob(unresolved, shared_state))
+    job_store.forget_buffered(entry_ids)
+
+
+def run_pipeline(args, shared_state: SharedState, seed) -> None:
+    run_engine(args, shared_state, seed)
+    if shared_state.unresolved_buffer.buffer:
+        # Buffered after the dispatcher's final flush; resolve them (past the deadline their detail
+        # scrapes are skipped and recorded like any other fetch)
+        run_engine(args, shared_state, seed_unresolved_jobs)
+
+    # The last partial batch of saves is still in the buffer once the queue drains
+    flush_save_buffer(shared_state)
+    # The pipeline's threads are gone; close their connections (sharded workers run this per unit)
+    db_connections.close_all()
+
+
+def worker_args(args) -> list:
+    """
+    Command-line options passed on to workers started with --spawn.
+    """
+    passed = ["--run-id", args.run_id, "--engine", args.engine, "--concurrency", str(args.concurrency),
+              "--parser", args.parser, "--cache", args.cache]
+    if args.max_runtime:
+        passed += ["--max-runtime", str(args.max_runtime)]
+    return passed + (["--card-only"] if args.card_only else []) + (["--delta"] if args.delta else [])
+
+
+def run_sharded(args, shared_state: SharedState) -> None:
+    store = WorkUnitStore()
+
+    def process_unit(unit: WorkUnit) -> None:
+        run_pipeline(args, shared_state, lambda job_queue, state: seed_unit_jobs(job_queue, state, unit))
+
+    if args.worker:
+        # Verification needs every unit's results, so only the coordinator runs it
+        shared_state.verify_after_pages = False
+        completed = run_worker(store, args.run_id, process_unit, should_stop=lambda: run_deadline.closing)
+        print(f"[sharding] worker finished {completed} units")
+        return
+
+    total = store.plan(args.run_id, plan_units())
+    print(f"[coordinator] run {args.run_id}: {total} work units")
+    processes = spawn_workers(args.spawn, worker_args(args))
+    if not wait_for_run(store, args.run_id, processes, should_stop=lambda: run_deadline.closing):
+        print("[coordinator] workers exited with units left; finishing them here")
+        shared_state.verify_after_pages = False
+        run_worker(store, args.run_id, process_unit, should_stop=lambda: run_deadline.closing)
+    run_pipeline(args, shared_state, seed_verifier_jobs)
+
+
+def main():
+    args = parse_args()
+    response_cache.mode = args.cache
+    removed, freed = response_cache.prune()
+    if removed:
+        print(f"[response cache] pruned {removed} entries ({freed / 1024 / 1024:.1f} MB)")
+    DETAIL_BACKFILL_CONFIG["card_only"] = args.card_only
+    DELTA_CONFIG["enabled"] = args.delta
+    run_deadline.start(args.max_runtime)
+    if args.resume or JOB_STORE_CONFIG["enabled"]:
+        job_store.enable()
+        if not args.resume:
+            job_store.start_fresh()
+    print(f"[parser] using {configure_parser(args.parser).name}")
+    init_db()
+    print(f"[listing index] loaded {listing_index.load()} listing ids")
+
+    shared_state = SharedState(batch_size=200)
+    tracker = StatusTracker()
+    shared_state.tracker = tracker
+
+    if not args.worker:
+        tracker.start_loop()
+    ua_registry.start_autosave()
 
-    for _ in workers:
-        job_queue.put(StopJob())
-    for w in workers:
-        w.join()
+    if args.coordinator or args.worker:
+        run_sharded(args, shared_state)
+    else:
+        if args.resume:
+            seed = resume_jobs
+        elif args.backfill_only:
+            seed = seed_backfill_jobs
+        else:
+            seed = seed_page_jobs
+        run_pipeline(args, shared_state, seed)
 
     tracker.stop()
+    ua_registry.shutdown()
+    session_pool.close_all()
+    browser_pool.close_all()
+    parse_pool.shutdown()
+    print(f"[sqlite] listings DB connections opened: {db_connections.get_stats()['opened']}")
+    db_connections.close_all()
+    if job_store.enabled:
+        print(f"[job store] today's jobs by status: {job_store.get_stats()}")
+        job_store.close()
+    print(f"[http pool] {pool_stats.get_stats()}")
+    print(f"[rate limiter] final rates (req/s): {rate_scheduler.get_stats()}")
+    print(f"[response cache] {response_cache.get_stats()}")
+    print(f"[parser] extraction paths: {parse_pool.get_stats()}")
+    print(f"[backpressure] {backpressure.get_stats()}")
+    report = run_deadline.write_report()
+    if report:
+        print(f"[deadline] skipped {run_deadline.get_stats()}; details in {report}")
+    print(f"[fetch policy] breaker trips: {circuit_breaker.trips}, deferred retries: {shared_state.retry_budget.spent}")
 
 
 if __name__ == "__main__":
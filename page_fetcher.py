@@ -1,75 +1,120 @@
 import requests
-import random
-import time
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from fake_useragent import UserAgent
-from user_agent_tracking import get_valid_user_agents, log_user_agent, read_user_agent_set
+from user_agent_tracking import choose_user_agents, ua_registry
+from http_pool import session_pool
+from rate_limiter import rate_scheduler
+from browser_pool import browser_pool
+from response_cache import response_cache
+from fetch_policy import (circuit_breaker, classify_response, parse_retry_after, record_fetch_outcome,
+                          GIVE_UP_OUTCOMES, USER_AGENT_FAILURES, OK, TIMEOUT, CONNECTION_ERROR, DEADLINE)
+from run_deadline import run_deadline
+from utils.html_parser import get_parser
+from config import HTTP_POOL_CONFIG, BROWSER_POOL_CONFIG, BASE_URL, FETCH_POLICY_CONFIG
 
 total_bytes_downloaded = 0
 total_requests_made = 0
 
 
-def fetch_soup_with_fallback(url, max_attempts=10):
-    global total_bytes_downloaded, total_requests_made
-    user_agents = get_valid_user_agents()
+def fetch_soup_with_fallback(url, max_attempts=FETCH_POLICY_CONFIG["attempts_per_fetch"]):
+    html, source = fetch_html_with_fallback(url, max_attempts)
+    if html is None:
+        return None, None
+    return make_soup(html), source
+
+
+def fetch_html_with_fallback(url, max_attempts=FETCH_POLICY_CONFIG["attempts_per_fetch"]):
+    page_type = page_type_for_url(url)
+    cached_html = response_cache.get(url, page_type)
+    if cached_html is not None:
+        return cached_html, "cache"
+    if response_cache.replay:
+        print(f"[replay] cache miss {url}")
+        return None, None
+
     tried_user_agents = set()
-    failed_user_agents = read_user_agent_set("failed_user_agents.log")
+    outcome = None
 
-    for ua in random.sample(user_agents, min(max_attempts, len(user_agents))):
-        soup = try_agent(url, ua)
-        if soup is not None:
-            return soup, "requests"
+    for ua in choose_user_agents(max_attempts):
+        tried_user_agents.add(ua)
+        html, outcome = try_agent(url, ua)
+        if html is not None:
+            return html, "requests"
+        if outcome in GIVE_UP_OUTCOMES:
+            # Throttled or erroring server, or out of time: more agents won't help, let the job be deferred
+            return None, None
 
     # Try generating and testing new random user agents before cloudscraper
     ua_generator = UserAgent()
     for _ in range(max_attempts):
         ua = ua_generator.random
-        if ua in tried_user_agents or ua in failed_user_agents:
+        if ua in tried_user_agents or ua_registry.is_failed(ua):
             continue
         else:
-            soup = try_agent(url, ua)
-            if soup is not None:
-                return soup, "requests"
+            tried_user_agents.add(ua)
+            html, outcome = try_agent(url, ua)
+            if html is not None:
+                return html, "requests"
+            if outcome in GIVE_UP_OUTCOMES:
+                return None, None
+
+    # Final fallback: Selenium, only worth it when the site is rejecting plain requests
+    if outcome is None or outcome in USER_AGENT_FAILURES:
+        return fetch_with_selenium(url)
+    return None, None
 
-    # Final fallback: Selenium
+
+def fetch_with_selenium(url):
+    global total_bytes_downloaded, total_requests_made
     print(f"[selenium fallback] {url}")
     try:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1920x1080")
-        options.add_argument("--log-level=3")
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install(), log_path="/dev/null"), options=options)
-        driver.get(url)
-        time.sleep(3)
-        html = driver.page_source
-        driver.quit()
+        with browser_pool.lease() as driver:
+            if not (circuit_breaker.wait_until_closed(run_deadline.time_left())
+                    and rate_scheduler.acquire(url, run_deadline.time_left())):
+                return None, None
+            driver.get(url)
+            browser_pool.wait_until_ready(driver, BROWSER_POOL_CONFIG["ready_selectors"].get(page_type_for_url(url)))
+            html = driver.page_source
+        response_cache.put(url, html, page_type_for_url(url))
         total_bytes_downloaded += len(html.encode("utf-8"))
         total_requests_made += 1
-        return BeautifulSoup(html, "html.parser"), "selenium"
+        return html, "selenium"
     except Exception as e:
         print(f"[selenium error] {url} | {e}")
         return None, None
 
 
+def page_type_for_url(url):
+    return "results" if url.startswith(BASE_URL) else "detail"
+
+
+def make_soup(html):
+    return get_parser().parse(html)
+
+
 def try_agent(url, ua):
+    """
+    Makes one request with the given user agent. Returns (html or None, outcome).
+    """
     global total_bytes_downloaded, total_requests_made
-    headers = {"User-Agent": ua}
+    if not (circuit_breaker.wait_until_closed(run_deadline.time_left())
+            and rate_scheduler.acquire(url, run_deadline.time_left())):
+        return None, DEADLINE
     try:
-        time.sleep(random.uniform(2.0, 4.0))
-        res = requests.get(url, headers=headers, timeout=5)
-        total_requests_made += 1
-        total_bytes_downloaded += len(res.content)
-        if res.status_code == 200 and res.text.strip():
-            log_user_agent(ua, success=True)
-            return BeautifulSoup(res.text, "html.parser")
-        else:
-            log_user_agent(ua, success=False)
-            return None
-    except requests.exceptions.RequestException as e:
-        log_user_agent(ua, success=False)
-        return None
+        res = session_pool.get(url, ua, timeout=HTTP_POOL_CONFIG["timeout"])
+    except requests.exceptions.Timeout:
+        record_fetch_outcome(url, ua, TIMEOUT)
+        return None, TIMEOUT
+    except requests.exceptions.RequestException:
+        record_fetch_outcome(url, ua, CONNECTION_ERROR)
+        return None, CONNECTION_ERROR
+
+    total_requests_made += 1
+    total_bytes_downloaded += len(res.content)
+    outcome = classify_response(res.status_code, res.text)
+    record_fetch_outcome(url, ua, outcome, latency=res.elapsed.total_seconds(),
+                         retry_after=parse_retry_after(res.headers.get("Retry-After")))
+    if outcome != OK:
+        return None, outcome
+
+    response_cache.put(url, res.text, page_type_for_url(url))
+    return res.text, outcome
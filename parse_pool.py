@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from config import PARSE_POOL_SIZE
+from utils.html_parser import configure_parser, get_parser
+from utils.soup_helpers import parse_results_page, parse_detail_page
+
+PARSERS = {
+    "results": parse_results_page,
+    "detail": parse_detail_page,
+}
+
+
+class ParsePool:
+    """
+    Process pool that turns downloaded HTML into plain dicts. Fetch threads block on the result
+    without holding the GIL, so parsing runs on otherwise idle cores. A size of 0 parses inline.
+    """
+    def __init__(self, size: int = PARSE_POOL_SIZE):
+        self.size = size
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+        self.extraction_counts = Counter()  # "<page_kind>:<json|mixed|dom>" -> pages
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                # Children use the same backend the parent picked at startup
+                self.executor = ProcessPoolExecutor(max_workers=self.size, initializer=configure_parser,
+                                                    initargs=(get_parser().name,))
+            return self.executor
+
+    def parse(self, page_kind: str, html: str) -> dict:
+        fields = self._parse(PARSERS[page_kind], html)
+        with self.lock:
+            self.extraction_counts[f"{page_kind}:{fields['extraction']}"] += 1
+        return fields
+
+    def _parse(self, parse_fn, html: str) -> dict:
+        if self.size <= 0:
+            return parse_fn(html)
+        try:
+            return self._get_executor().submit(parse_fn, html).result()
+        except BrokenProcessPool:
+            print("[ParsePool] Worker process died; restarting pool")
+            with self.lock:
+                self.executor = None
+            return parse_fn(html)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.extraction_counts)
+
+    def shutdown(self) -> None:
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+
+parse_pool = ParsePool()
@@ -0,0 +1,125 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from config import RATE_LIMIT_CONFIG
+
+
+class HostRateLimiter:
+    """
+    Jittered token bucket for a single host. Callers reserve the next free slot and wait
+    until it starts, so the request rate is fixed by `rate` rather than by worker count.
+    The rate backs off on failures and creeps back up after a streak of successes.
+    """
+    def __init__(self, rate: float, config: Dict = RATE_LIMIT_CONFIG):
+        self.rate = rate
+        self.min_rate = config["min_rate"]
+        self.max_rate = config["max_rate"]
+        self.burst = max(1, config["burst"])
+        self.jitter = config["jitter"]
+        self.backoff_factor = config["backoff_factor"]
+        self.increase_step = config["increase_step"]
+        self.success_streak = config["success_streak"]
+
+        self.next_slot = time.monotonic()
+        self.paused_until = 0.0
+        self.successes = 0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Claims the next request slot and returns how many seconds to wait before using it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            interval = 1.0 / self.rate
+            start = max(self.next_slot, now - (self.burst - 1) * interval, self.paused_until)
+            self.next_slot = start + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            return max(0.0, start - now)
+
+    def wait_time(self) -> float:
+        """
+        Seconds until the next slot opens, without claiming it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            interval = 1.0 / self.rate
+            return max(0.0, max(self.next_slot, now - (self.burst - 1) * interval, self.paused_until) - now)
+
+    def record(self, success: bool) -> None:
+        with self.lock:
+            if success:
+                self.successes += 1
+                if self.successes >= self.success_streak:
+                    self.rate = min(self.max_rate, self.rate + self.increase_step)
+                    self.successes = 0
+            else:
+                self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+                self.successes = 0
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every slot for this host for at least `seconds`.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateScheduler:
+    """
+    Hands out request slots per host, shared by every worker thread and the asyncio engine.
+    """
+    def __init__(self, config: Dict = RATE_LIMIT_CONFIG):
+        self.config = config
+        self.limiters: Dict[str, HostRateLimiter] = {}
+        self.lock = threading.Lock()
+
+    def limiter_for(self, url: str) -> HostRateLimiter:
+        host = urlparse(url).netloc
+        with self.lock:
+            limiter = self.limiters.get(host)
+            if limiter is None:
+                rate = self.config["hosts"].get(host, self.config["default_rate"])
+                limiter = self.limiters[host] = HostRateLimiter(rate, self.config)
+            return limiter
+
+    def acquire(self, url: str, max_wait: Optional[float] = None) -> bool:
+        """
+        Waits for the next request slot for url's host. If the slot is further off than max_wait,
+        waits max_wait instead and returns False; the caller must not send the request.
+        """
+        delay = self.limiter_for(url).reserve()
+        if max_wait is not None and delay > max_wait:
+            time.sleep(max_wait)
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    async def acquire_async(self, url: str, max_wait: Optional[float] = None) -> bool:
+        delay = self.limiter_for(url).reserve()
+        if max_wait is not None and delay > max_wait:
+            await asyncio.sleep(max_wait)
+            return False
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return True
+
+    def wait_time(self, url: str) -> float:
+        return self.limiter_for(url).wait_time()
+
+    def record(self, url: str, success: bool) -> None:
+        self.limiter_for(url).record(success)
+
+    def pause(self, url: str, seconds: float) -> None:
+        self.limiter_for(url).pause(seconds)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self.lock:
+            return {host: round(limiter.rate, 2) for host, limiter in self.limiters.items()}
+
+
+rate_scheduler = RateScheduler()
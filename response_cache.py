@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import RESPONSE_CACHE_CONFIG
+
+
+class ResponseCache:
+    """
+    On-disk cache of fetched HTML keyed by URL. Each entry is a gzip file holding a JSON header line
+    (url, page type, fetch time) followed by the page body. Entries expire per page type, except in
+    replay mode, where anything cached is served and nothing is fetched.
+    """
+    def __init__(self, cache_dir: str = RESPONSE_CACHE_CONFIG["dir"],
+                 ttl_seconds: Dict[str, int] = RESPONSE_CACHE_CONFIG["ttl_seconds"],
+                 mode: str = RESPONSE_CACHE_CONFIG["mode"],
+                 max_age_days: float = RESPONSE_CACHE_CONFIG["max_age_days"],
+                 max_size_mb: float = RESPONSE_CACHE_CONFIG["max_size_mb"]):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.mode = mode
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.writes = 0
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".html.gz")
+
+    def _count(self, field: str) -> None:
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get(self, url: str, page_type: str) -> Optional[str]:
+        """
+        Returns the cached HTML for url if present and fresh (or present at all in replay mode).
+        """
+        if not self.enabled:
+            return None
+        path = self._path(url)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                html = f.read()
+        except (OSError, EOFError, ValueError):
+            self._count("misses")
+            return None
+
+        if header.get("url") != url:
+            self._count("misses")
+            return None
+
+        ttl = self.ttl_seconds.get(page_type, 0)
+        if not self.replay and time.time() - header.get("fetched_at", 0) > ttl:
+            self._count("stale")
+            self._remove(path)
+            return None
+
+        self._count("hits")
+        return html
+
+    def put(self, url: str, html: str, page_type: str) -> None:
+        if not self.enabled or self.replay:
+            return
+        path = self._path(url)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        header = json.dumps({"url": url, "page_type": page_type, "fetched_at": time.time()})
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                f.write(header + "\n")
+                f.write(html)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[ResponseCache] Failed to write {url}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._count("writes")
+
+    def _remove(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def prune(self) -> Tuple[int, int]:
+        """
+        Deletes entries older than max_age_days (and leftover temp files), then the oldest entries
+        until the cache fits in max_size_mb. Only in normal mode; replay keeps everything it has.
+        Returns (files removed, bytes freed).
+        """
+        if self.mode != "normal":
+            return 0, 0
+        entries = []
+        for directory, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path, name.endswith(".tmp")))
+
+        cutoff = time.time() - self.max_age_seconds
+        removed = freed = 0
+        kept_size = 0
+        kept = []
+        for mtime, size, path, temp in sorted(entries):
+            if temp or mtime < cutoff:
+                removed += 1
+                freed += self._remove(path)
+            else:
+                kept.append((size, path))
+                kept_size += size
+        for size, path in kept:
+            if kept_size <= self.max_size_bytes:
+                break
+            removed += 1
+            freed += self._remove(path)
+            kept_size -= size
+        return removed, freed
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "stale": self.stale, "writes": self.writes}
+
+
+response_cache = ResponseCache()
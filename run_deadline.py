@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import RUN_DEADLINE_CONFIG
+from job_store import job_store
+
+
+class RunDeadline:
+    """
+    Optional wall-clock limit for a run (main.py --max-runtime). Once the deadline minus the drain
+    window is reached, admission closes: fetch jobs and producers are skipped instead of run, and the
+    jobs already fetched are parsed and saved while the queue drains. Skipped jobs are counted, kept
+    as pending in the job store (when enabled) for --resume, and written to a report at the end.
+    Inactive until start() is called.
+    """
+    def __init__(self, config: Dict = RUN_DEADLINE_CONFIG):
+        self.drain_seconds = config["drain_minutes"] * 60
+        self.report_dir = config["report_dir"]
+        self.deadline: Optional[float] = None
+        self.skipped = Counter()
+        self.skipped_urls: List[str] = []
+        self.announced = False
+        self.lock = threading.Lock()
+
+    def start(self, max_runtime_minutes: Optional[float]) -> None:
+        if max_runtime_minutes:
+            self.deadline = time.time() + max_runtime_minutes * 60
+            print(f"[deadline] run ends by {datetime.fromtimestamp(self.deadline).strftime('%H:%M:%S')}")
+
+    def time_left(self) -> Optional[float]:
+        """
+        Seconds until admission closes, or None without a deadline. Fetches cap their waits for a
+        rate limit slot or a breaker cooldown to this.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.drain_seconds - time.time())
+
+    @property
+    def closing(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline - self.drain_seconds
+
+    def skip(self, job) -> None:
+        """
+        Records a job dropped because admission has closed.
+        """
+        job_store.mark_pending(job)
+        with self.lock:
+            if not self.announced:
+                self.announced = True
+                print("[deadline] admission closed, draining queued work")
+            self.skipped[job.__class__.__name__] += 1
+            if hasattr(job, "build_url"):
+                self.skipped_urls.append(job.build_url())
+
+    def skip_backlog(self, job_type: str, count: int) -> None:
+        """
+        Records the items a producer would still have enqueued.
+        """
+        with self.lock:
+            self.skipped[job_type] += count
+
+    def write_report(self) -> Optional[str]:
+        """
+        Writes the skipped work to report_dir. Returns the report path, or None if nothing was skipped.
+        """
+        with self.lock:
+            if not self.skipped:
+                return None
+            report = {
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "deadline": datetime.fromtimestamp(self.deadline).isoformat(timespec="seconds") if self.deadline else None,
+                "skipped": dict(self.skipped),
+                "urls": self.skipped_urls,
+            }
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"skipped-{datetime.now():%Y%m%d-%H%M%S}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.skipped)
+
+
+run_deadline = RunDeadline()
@@ -0,0 +1,256 @@
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+from config import SEARCH_CONFIG, SHARDING_CONFIG
+from sqlite_connections import connect
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+
+
+@dataclass(slots=True)
+class WorkUnit:
+    """
+    One leasable slice of a scrape run: a model, a scope and a range of result pages.
+    """
+    id: int
+    make: str
+    model: str
+    scope: str
+    first_page: int
+    last_page: int
+
+
+def plan_units(pages_per_unit: int = SHARDING_CONFIG["pages_per_unit"]) -> List[Dict]:
+    """
+    Splits SEARCH_CONFIG into (model, scope, page range) units.
+    """
+    total_pages = SEARCH_CONFIG["pages"]
+    units = []
+    for entry in SEARCH_CONFIG["models"]:
+        for scope in ("local", "national"):
+            for first_page in range(1, total_pages + 1, pages_per_unit):
+                units.append({
+                    "make": entry["make"],
+                    "model": entry["model"],
+                    "scope": scope,
+                    "first_page": first_page,
+                    "last_page": min(first_page + pages_per_unit - 1, total_pages),
+                })
+    return units
+
+
+def default_run_id() -> str:
+    return date.today().isoformat()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkUnitStore:
+    """
+    Shared lease table for sharded runs. Any process that can open the SQLite file (a local path,
+    or a network share for several hosts) can plan, lease and complete units. A lease that is not
+    renewed within lease_seconds expires, and the unit goes back to the pool, so a dead worker's
+    pages are picked up by the others.
+    """
+    def __init__(self, path: str = SHARDING_CONFIG["path"], lease_seconds: int = SHARDING_CONFIG["lease_seconds"]):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS work_units (
+                id INTEGER PRIMARY KEY,
+                run_id TEXT,
+                make TEXT,
+                model TEXT,
+                scope TEXT,
+                first_page INTEGER,
+                last_page INTEGER,
+                status TEXT DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER DEFAULT 0
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_work_units_run ON work_units (run_id, status)")
+
+    def connect(self) -> sqlite3.Connection:
+        # Short transactions from many processes, possibly on several hosts: rollback journal rather
+        # than WAL, waiting on the file lock (busy timeout) instead of failing
+        return connect(self.path, journal_mode="DELETE", isolation_level=None)
+
+    def plan(self, run_id: str, units: List[Dict]) -> int:
+        """
+        Creates the run's units unless they already exist (re-running the coordinator continues the run).
+        Returns the number of units in the run.
+        """
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = conn.execute("SELECT COUNT(*) FROM work_units WHERE run_id = ?", (run_id,)).fetchone()[0]
+            if existing == 0:
+                conn.executemany(
+                    "INSERT INTO work_units (run_id, make, model, scope, first_page, last_page) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, u["make"], u["model"], u["scope"], u["first_page"], u["last_page"]) for u in units])
+            conn.execute("COMMIT")
+            return existing or len(units)
+        finally:
+            conn.close()
+
+    def lease(self, run_id: str, worker_id: str) -> Optional[WorkUnit]:
+        """
+        Leases the next pending or expired unit of the run, or returns None when none is available.
+        """
+        now = time.time()
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT id, make, model, scope, first_page, last_page FROM work_units
+                WHERE run_id = ? AND (status = ? OR (status = ? AND lease_expires < ?))
+                ORDER BY attempts, id LIMIT 1
+            """, (run_id, PENDING, LEASED, now)).fetchone()
+            if row is not None:
+                conn.execute("""
+                    UPDATE work_units SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1
+                    WHERE id = ?
+                """, (LEASED, worker_id, now + self.lease_seconds, row[0]))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return WorkUnit(*row) if row is not None else None
+
+    def renew(self, unit_id: int, worker_id: str) -> bool:
+        """
+        Extends a lease. Returns False if the lease was lost (expired and taken by another worker).
+        """
+        with closing(self.connect()) as conn:
+            cur = conn.execute("UPDATE work_units SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ?",
+                               (time.time() + self.lease_seconds, unit_id, worker_id, LEASED))
+            return cur.rowcount == 1
+
+    def complete(self, unit_id: int, worker_id: str) -> None:
+        with closing(self.connect()) as conn:
+            conn.execute("UPDATE work_units SET status = ?, lease_expires = NULL WHERE id = ? AND worker = ?",
+                         (DONE, unit_id, worker_id))
+
+    def release(self, unit_id: int, worker_id: str) -> None:
+        with closing(self.connect()) as conn:
+            conn.execute("UPDATE work_units SET status = ?, worker = NULL, lease_expires = NULL WHERE id = ? AND worker = ?",
+                         (PENDING, unit_id, worker_id))
+
+    def progress(self, run_id: str) -> Dict[str, int]:
+        with closing(self.connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM work_units WHERE run_id = ? GROUP BY status",
+                                (run_id,)).fetchall()
+        return dict(rows)
+
+
+class LeaseHeartbeat(threading.Thread):
+    """
+    Renews a unit's lease in the background while the worker processes it.
+    """
+    def __init__(self, store: WorkUnitStore, unit_id: int, worker_id: str):
+        super().__init__(daemon=True)
+        self.store = store
+        self.unit_id = unit_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.store.lease_seconds / 3):
+            if not self.store.renew(self.unit_id, self.worker_id):
+                self.lost = True
+                print(f"[sharding] lease on unit {self.unit_id} lost")
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+def run_worker(store: WorkUnitStore, run_id: str, process_unit: Callable[[WorkUnit], None],
+               worker_id: Optional[str] = None, should_stop: Callable[[], bool] = lambda: False) -> int:
+    """
+    Leases and processes units until every unit of the run is done, waiting on other workers' leases
+    in case they expire, or until should_stop() (e.g. the run's deadline). A unit cut short by
+    should_stop is released for another run. Returns the number of units this worker completed.
+    """
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    while not should_stop():
+        unit = store.lease(run_id, worker_id)
+        if unit is None:
+            progress = store.progress(run_id)
+            if progress.get(LEASED, 0) == 0:
+                return completed
+            time.sleep(SHARDING_CONFIG["poll_seconds"])
+            continue
+
+        print(f"[sharding] {worker_id} took unit {unit.id}: {unit.model} {unit.scope} pages {unit.first_page}-{unit.last_page}")
+        heartbeat = LeaseHeartbeat(store, unit.id, worker_id)
+        heartbeat.start()
+        try:
+            process_unit(unit)
+        except BaseException:
+            store.release(unit.id, worker_id)
+            raise
+        finally:
+            heartbeat.stop()
+
+        if heartbeat.lost:
+            continue
+        if should_stop():
+            store.release(unit.id, worker_id)
+        else:
+            store.complete(unit.id, worker_id)
+            completed += 1
+    return completed
+
+
+def spawn_workers(count: int, worker_args: List[str]) -> List[subprocess.Popen]:
+    """
+    Starts local worker processes running main.py --worker. Their output goes to data/logs/.
+    """
+    log_dir = SHARDING_CONFIG["log_dir"]
+    os.makedirs(log_dir, exist_ok=True)
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    processes = []
+    for i in range(count):
+        log = open(os.path.join(log_dir, f"worker-{i + 1}.log"), "a", encoding="utf-8")
+        processes.append(subprocess.Popen([sys.executable, main_py, "--worker", *worker_args],
+                                          stdout=log, stderr=subprocess.STDOUT))
+        log.close()  # the child keeps its own handle
+    return processes
+
+
+def wait_for_run(store: WorkUnitStore, run_id: str, processes: List[subprocess.Popen],
+                 poll_seconds: float = SHARDING_CONFIG["poll_seconds"],
+                 should_stop: Callable[[], bool] = lambda: False) -> bool:
+    """
+    Reports progress until every unit is done or should_stop(). Returns False if the spawned workers
+    all exited with units still unfinished (the caller can then process them itself).
+    """
+    while not should_stop():
+        progress = store.progress(run_id)
+        total = sum(progress.values())
+        print(f"[coordinator] {progress.get(DONE, 0)}/{total} units done, {progress.get(LEASED, 0)} leased")
+        if progress.get(DONE, 0) >= total:
+            return True
+        if processes and all(p.poll() is not None for p in processes):
+            return False
+        time.sleep(poll_seconds)
+    return True
@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from config import SQLITE_CONFIG
+
+
+def configure(conn: sqlite3.Connection, config: Dict = SQLITE_CONFIG,
+              journal_mode: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Applies the SQLITE_CONFIG pragmas to a connection. journal_mode overrides the configured one
+    (e.g. a lease file on a network share can't use WAL).
+    """
+    conn.execute(f"PRAGMA busy_timeout = {int(config['busy_timeout_ms'])}")
+    conn.execute(f"PRAGMA journal_mode = {journal_mode or config['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {config['synchronous']}")
+    # Negative cache_size is in KiB rather than pages
+    conn.execute(f"PRAGMA cache_size = -{int(config['cache_size_kib'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(config['mmap_size_bytes'])}")
+    conn.execute(f"PRAGMA temp_store = {config['temp_store']}")
+    return conn
+
+
+def connect(path: str, journal_mode: Optional[str] = None, **kwargs) -> sqlite3.Connection:
+    """
+    Opens a connection with the configured busy timeout and pragmas.
+    """
+    conn = sqlite3.connect(path, timeout=SQLITE_CONFIG["busy_timeout_ms"] / 1000, **kwargs)
+    return configure(conn, journal_mode=journal_mode)
+
+
+class ConnectionManager:
+    """
+    Keeps one open connection to a database file per thread, so workers reuse their connection
+    (and its page cache) instead of reconnecting for every query. Each connection is only used by
+    the thread that opened it; close_all() at shutdown closes them all.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.connections: List[sqlite3.Connection] = []
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # check_same_thread is off only so close_all() can run from the main thread
+            conn = connect(self.path, check_same_thread=False)
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+                self.opened += 1
+        return conn
+
+    def close_all(self) -> None:
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        # Threads that ask again get a fresh connection
+        self.local = threading.local()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"open": len(self.connections), "opened": self.opened}
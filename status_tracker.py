@@ -2,7 +2,7 @@ from collections import defaultdict, deque
 import threading
 import time
 
-from rich.console import Console
+from rich.console import Console, Group
 from rich.table import Table
 from rich.live import Live
 
@@ -46,6 +46,7 @@ class StatusTracker:
     def __init__(self):
         self.jobs = defaultdict(JobStatus)
         self.running = False
+        self.pools = None  # Optional WorkerPools whose depth and utilization are shown
 
     def record_start(self, job_type: str):
         self.jobs[job_type].job_started()
@@ -85,4 +86,25 @@ class StatusTracker:
                 f"{stats['avg_time']:.1f}s",
                 eta_fmt
             )
+
+        if self.pools is None:
+            return table
+        return Group(table, self.render_pools())
+
+    def render_pools(self):
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Pool", style="cyan")
+        table.add_column("Workers", justify="right")
+        table.add_column("Busy", justify="right")
+        table.add_column("Queued", justify="right")
+        table.add_column("Utilization", justify="right")
+
+        for name, stats in self.pools.get_stats().items():
+            table.add_row(
+                name,
+                str(stats["size"]),
+                str(stats["busy"]),
+                str(stats["depth"]),
+                f"{stats['utilization']:.0%}"
+            )
         return table
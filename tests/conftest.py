@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The scraper's modules are imported top-level (import db, import job), as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from sqlite_connections import ConnectionManager  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """
+    Points db at an empty listings DB under tmp_path. Returns its path; call db.init_db() to create it.
+    """
+    path = str(tmp_path / "cars.db")
+    connections = ConnectionManager(path)
+    monkeypatch.setattr(db, "DB_PATH", path)
+    monkeypatch.setattr(db, "db_connections", connections)
+    yield path
+    connections.close_all()
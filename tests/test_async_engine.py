@@ -0,0 +1,270 @@
+"""
+Drives the asyncio engine end to end against a local stand-in for cars.com: results and detail
+pages are served by http.server on 127.0.0.1, and every fetch goes through the real AsyncFetcher,
+fetch policy, parse stage and save path into a temporary listings DB.
+"""
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("bs4")
+pytest.importorskip("fake_useragent")
+
+import async_engine  # noqa: E402
+import db  # noqa: E402
+import fetch_policy  # noqa: E402
+import jobs.page_loader  # noqa: E402
+import page_fetcher  # noqa: E402
+import user_agent_tracking  # noqa: E402
+import utils.card_record  # noqa: E402
+from async_engine import AsyncEngine  # noqa: E402
+from config import FETCH_POLICY_CONFIG, RATE_LIMIT_CONFIG  # noqa: E402
+from fetch_policy import OK, RATE_LIMITED, SERVER_ERROR, CircuitBreaker  # noqa: E402
+from job import SharedState  # noqa: E402
+from jobs.card_processing import DetailScrapeJob, flush_save_buffer  # noqa: E402
+from jobs.dispatcher import Dispatcher  # noqa: E402
+from jobs.page_loader import PageLoadJob  # noqa: E402
+from jobs.verifier import VerifyDetailJob  # noqa: E402
+from parse_pool import parse_pool  # noqa: E402
+from rate_limiter import RateScheduler  # noqa: E402
+from response_cache import response_cache  # noqa: E402
+from utils.card_record import CardRecord  # noqa: E402
+from utils.html_parser import configure_parser  # noqa: E402
+from user_agent_tracking import UserAgentRegistry  # noqa: E402
+from utils.job_utils import enqueue_with_priority  # noqa: E402
+
+# Seconds each response is held, so overlapping requests are observable
+RESPONSE_DELAY = 0.1
+
+CARD_HTML = """
+<div class="vehicle-card" data-listing-id="{listing_id}">
+  <a class="image-gallery-link" href="/vehicledetail/{listing_id}/"></a>
+  <h2 class="title">2024 Honda CR-V EX</h2>
+  <span class="primary-price">${price:,}</span>
+  <div class="dealer-name"><strong>Stand-in Honda</strong></div>
+  <div class="miles-from">Chicago, IL (12 mi.)</div>
+</div>
+"""
+
+DETAIL_HTML = """
+<html><body>
+  <span class="primary-price">${price:,}</span>
+  <dl><dt>VIN</dt><dd>{vin}</dd><dt>Mileage</dt><dd>5 mi.</dd></dl>
+  <div class="price-history-summary"><div class="listed-time"><strong>3</strong></div></div>
+</body></html>
+"""
+
+
+def results_html(listing_ids):
+    cards = "".join(CARD_HTML.format(listing_id=listing_id, price=30000) for listing_id in listing_ids)
+    return f"<html><body><span class=\"total-filter-count\">{len(listing_ids)} matches</span>{cards}</body></html>"
+
+
+def detail_html(listing_id, price=29000):
+    return DETAIL_HTML.format(vin=f"VIN{listing_id}", price=price)
+
+
+class StandIn:
+    """
+    Canned cars.com. /shopping/results/ lists `listing_ids`; /vehicledetail/<id>/ is a detail page;
+    /flaky/<id>/ answers 429 once and then the detail page; /down/<id>/ always answers 503.
+    """
+    def __init__(self, listing_ids):
+        self.listing_ids = listing_ids
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def respond(self, path):
+        listing_id = path.rstrip("/").split("/")[-1]
+        if path.startswith("/shopping/results/"):
+            return 200, results_html(self.listing_ids), {}
+        if path.startswith("/vehicledetail/"):
+            return 200, detail_html(listing_id), {}
+        if path.startswith("/flaky/"):
+            if self.requests.count(path) == 1:
+                return 429, "slow down", {"Retry-After": "0"}
+            return 200, detail_html(listing_id, price=28000), {}
+        if path.startswith("/down/"):
+            return 503, "unavailable", {}
+        return 404, "not found", {}
+
+    def handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stand_in.lock:
+                    stand_in.requests.append(self.path)
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                time.sleep(RESPONSE_DELAY)
+                status, body, headers = stand_in.respond(self.path)
+                # Done before the response goes out, so the client can't start its next request first
+                with stand_in.lock:
+                    stand_in.in_flight -= 1
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class Tracker:
+    def record_start(self, job_type):
+        pass
+
+    def record_complete(self, job_type):
+        pass
+
+
+@pytest.fixture
+def stand_in(temp_db, tmp_path, monkeypatch):
+    """
+    Starts the stand-in server and points the scraper, its fetch policy and its DB at test instances.
+    """
+    site = StandIn([f"L{i}" for i in range(12)])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), site.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    monkeypatch.setattr(jobs.page_loader, "BASE_URL", f"{base}/shopping/results/")
+    monkeypatch.setattr(page_fetcher, "BASE_URL", f"{base}/shopping/results/")
+    monkeypatch.setattr(utils.card_record, "DETAIL_BASE_URL", base)
+    monkeypatch.setattr(async_engine, "choose_user_agents", lambda k: ["stand-in-agent"])
+    # Keeps the stand-in agent out of the repo's user agent logs
+    monkeypatch.setattr(user_agent_tracking, "ua_registry", UserAgentRegistry(
+        str(tmp_path / "successful.log"), str(tmp_path / "failed.log"), str(tmp_path / "valid.txt")))
+    monkeypatch.setattr(response_cache, "mode", "off")
+    monkeypatch.setattr(parse_pool, "size", 0)
+
+    # Fresh fetch policy state, with no rate limiting or breaker trips getting in the way
+    rates = RateScheduler({**RATE_LIMIT_CONFIG, "default_rate": 1000.0, "min_rate": 1000.0, "max_rate": 1000.0,
+                           "burst": 100, "jitter": 0.0})
+    breaker = CircuitBreaker(min_samples=1000)
+    for module in (async_engine, fetch_policy):
+        monkeypatch.setattr(module, "rate_scheduler", rates)
+        monkeypatch.setattr(module, "circuit_breaker", breaker)
+
+    outcomes = []
+    record_fetch_outcome = fetch_policy.record_fetch_outcome
+
+    def recording_outcome(url, ua, outcome, **kwargs):
+        outcomes.append((url.replace(base, ""), outcome))
+        record_fetch_outcome(url, ua, outcome, **kwargs)
+
+    monkeypatch.setattr(async_engine, "record_fetch_outcome", recording_outcome)
+
+    configure_parser("html.parser")
+    db.init_db()
+    site.base = base
+    site.outcomes = outcomes
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+def make_shared_state():
+    shared_state = SharedState(batch_size=200)
+    shared_state.tracker = Tracker()
+    shared_state.verify_after_pages = False
+    return shared_state
+
+
+def run_engine(engine, shared_state, seed, timeout=60):
+    """
+    Runs the engine on a thread like main.run_pipeline does, flushes the save buffer, and fails the
+    test if the engine doesn't return.
+    """
+    runner = threading.Thread(target=engine.run, args=(lambda job_queue: seed(job_queue, shared_state),), daemon=True)
+    runner.start()
+    runner.join(timeout)
+    assert not runner.is_alive(), "engine did not exit"
+    flush_save_buffer(shared_state)
+
+
+def saved_listings():
+    with db.get_db_conn() as conn:
+        return {row[0]: row[1:] for row in conn.execute(
+            "SELECT listing_id, vin, title, price, search_scope, last_seen, status FROM listings")}
+
+
+def test_results_page_flows_to_saved_listings(stand_in):
+    def seed(job_queue, shared_state):
+        shared_state.dispatcher = Dispatcher(job_queue, shared_state)
+        page = PageLoadJob(page_num=1, makes=["honda"], models=["honda-cr_v"], scope="local", zip_code="60601",
+                           radius=50, shared_state=shared_state, delta=False)
+        shared_state.dispatcher.expect_pages(page.group, 1)
+        enqueue_with_priority(job_queue, page)
+        shared_state.dispatcher.seal()
+
+    engine = AsyncEngine(concurrency=4, blocking_workers=2)
+    run_engine(engine, make_shared_state(), seed)
+
+    listings = saved_listings()
+    assert set(listings) == set(stand_in.listing_ids)
+    vin, title, price, scope, _, status = listings["L3"]
+    assert (vin, title, price, scope, status) == ("VINL3", "2024 Honda CR-V EX", 29000, "local", "active")
+    # One results page, then one detail page per card
+    assert len(stand_in.requests) == 1 + len(stand_in.listing_ids)
+    assert engine.executor._shutdown
+    assert all(executor._shutdown for executor in engine.pool_executors.values())
+
+
+def test_concurrency_cap_is_respected(stand_in):
+    def seed(job_queue, shared_state):
+        for listing_id in stand_in.listing_ids:
+            card = CardRecord(listing_id=listing_id, detail_path=f"/vehicledetail/{listing_id}/", title="2024 Honda CR-V EX")
+            enqueue_with_priority(job_queue, DetailScrapeJob(listing_id, card, shared_state))
+
+    run_engine(AsyncEngine(concurrency=3, blocking_workers=2), make_shared_state(), seed)
+
+    assert len(stand_in.requests) == len(stand_in.listing_ids)
+    assert 1 < stand_in.max_in_flight <= 3
+    assert len(saved_listings()) == len(stand_in.listing_ids)
+
+
+def test_rate_limited_fetch_is_deferred_and_retried(stand_in):
+    db.flush_listings_to_db([{"vin": "VINL1", "listing_id": "L1", "price": 30000, "title": "2024 Honda CR-V EX"}])
+    with db.get_db_conn() as conn:
+        conn.execute("UPDATE listings SET last_seen = '2026-01-01'")
+        conn.commit()
+
+    def seed(job_queue, shared_state):
+        enqueue_with_priority(job_queue, VerifyDetailJob("VINL1", f"{stand_in.base}/flaky/L1/", shared_state))
+
+    shared_state = make_shared_state()
+    run_engine(AsyncEngine(concurrency=2, blocking_workers=2), shared_state, seed)
+
+    assert stand_in.outcomes == [("/flaky/L1/", RATE_LIMITED), ("/flaky/L1/", OK)]
+    assert shared_state.retry_budget.spent == 1
+    _, _, price, _, last_seen, status = saved_listings()["L1"]
+    assert (price, last_seen, status) == (28000, date.today().isoformat(), "active")
+
+
+def test_server_errors_exhaust_deferrals_then_fail(stand_in, capsys):
+    def seed(job_queue, shared_state):
+        enqueue_with_priority(job_queue, VerifyDetailJob("VINL2", f"{stand_in.base}/down/L2/", shared_state))
+
+    shared_state = make_shared_state()
+    run_engine(AsyncEngine(concurrency=2, blocking_workers=2), shared_state, seed)
+
+    # The first try plus every deferral, each classified through the fetch policy
+    attempts = 1 + FETCH_POLICY_CONFIG["max_deferrals_per_job"]
+    assert stand_in.outcomes == [("/down/L2/", SERVER_ERROR)] * attempts
+    assert "[VerifyDetailJob] VINL2" in capsys.readouterr().out
+    assert "L2" not in saved_listings()
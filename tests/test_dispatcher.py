@@ -0,0 +1,41 @@
+from dataclasses import asdict
+
+from job import PrioritizedJobQueue, SharedState
+from jobs.dispatcher import Dispatcher
+from jobs.page_loader import PageLoadJob
+from utils.card_record import CardRecord
+
+
+class Tracker:
+    def record_start(self, job_type):
+        pass
+
+    def record_complete(self, job_type):
+        pass
+
+
+def results_fields(*listing_ids):
+    cards = [asdict(CardRecord(listing_id=listing_id, detail_path=f"/vehicledetail/{listing_id}/"))
+             for listing_id in listing_ids]
+    return {"cards": cards, "card_count": len(cards), "total_results": len(cards), "extraction": "dom"}
+
+
+def test_national_page_parsed_first_is_not_scraped_twice():
+    shared_state = SharedState(batch_size=100)
+    shared_state.tracker = Tracker()
+    job_queue = PrioritizedJobQueue()
+    shared_state.dispatcher = Dispatcher(job_queue, shared_state)
+    pages = {scope: PageLoadJob(page_num=1, makes=["honda"], models=["honda-cr_v"], scope=scope, zip_code="60601",
+                                radius=50, shared_state=shared_state, delta=False)
+             for scope in ("national", "local")}
+    for page in pages.values():
+        shared_state.dispatcher.expect_pages(page.group, 1)
+
+    pages["national"].handle_parsed(results_fields("1", "2"), job_queue)
+    pages["local"].handle_parsed(results_fields("2", "3"), job_queue)
+
+    unresolved = shared_state.unresolved_buffer.flush()
+    assert [listing_id for listing_id, _ in unresolved] == ["1", "2", "3"]
+    assert {listing_id: card.search_scope for listing_id, card in unresolved} == {
+        "1": "national", "2": "local", "3": "local"}
+    assert shared_state.was_seen("2", "local")
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+pytest.importorskip("bs4")
+
+from utils.html_parser import configure_parser  # noqa: E402
+from utils.soup_helpers import parse_detail_page  # noqa: E402
+
+VEHICLE_JSON = {
+    "@context": "https://schema.org",
+    "@type": "Car",
+    "name": "2024 Honda CR-V EX",
+    "vehicleIdentificationNumber": "MAIN",
+    "mileageFromOdometer": {"@type": "QuantitativeValue", "value": 12},
+    "offers": {"@type": "Offer", "price": 31000},
+}
+
+
+def payload_node(attribute, data, css_class="listing"):
+    return f"<div class=\"{css_class}\" {attribute}='{json.dumps(data)}'></div>"
+
+
+def detail_page(*nodes):
+    return (f"<html><head><script type=\"application/ld+json\">{json.dumps(VEHICLE_JSON)}</script></head>"
+            f"<body>{''.join(nodes)}</body></html>")
+
+
+@pytest.fixture(autouse=True)
+def soup_parser():
+    configure_parser("html.parser")
+
+
+def test_decoy_payload_node_is_ignored():
+    html = detail_page(
+        payload_node("data-vehicle-details", {"vin": "MAIN", "msrp": 35000, "daysOnMarket": 9}),
+        payload_node("data-override-payload", {"vin": "OTHER", "msrp": 99999, "daysOnMarket": 400}),
+    )
+
+    fields = parse_detail_page(html)
+
+    assert (fields["vin"], fields["msrp"], fields["days_on_market"]) == ("MAIN", 35000, 9)
+    assert (fields["price"], fields["mileage"]) == (31000, 12)
+
+
+def test_similar_vehicle_cards_are_skipped():
+    similar = (f"<div class=\"vehicle-card\">"
+               f"{payload_node('data-override-payload', {'msrp': 99999, 'daysOnMarket': 400})}</div>")
+    html = detail_page(similar, payload_node("data-vehicle-details", {"msrp": 35000, "daysOnMarket": 9}))
+
+    fields = parse_detail_page(html)
+
+    assert (fields["vin"], fields["msrp"], fields["days_on_market"]) == ("MAIN", 35000, 9)
@@ -0,0 +1,85 @@
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from config import FETCH_POLICY_CONFIG, RATE_LIMIT_CONFIG
+from fetch_policy import DEADLINE, SERVER_ERROR, CircuitBreaker, parse_retry_after
+from job import SharedState
+from jobs.verifier import VerifyDetailJob
+from rate_limiter import RateScheduler
+from run_deadline import run_deadline
+
+URL = "https://www.cars.com/vehicledetail/1/"
+
+
+@pytest.fixture
+def deadline_in(monkeypatch):
+    """
+    Sets the run deadline so admission closes `seconds` from now.
+    """
+    monkeypatch.setattr(run_deadline, "skipped", Counter())
+    monkeypatch.setattr(run_deadline, "skipped_urls", [])
+
+    def close_in(seconds):
+        monkeypatch.setattr(run_deadline, "deadline", time.time() + run_deadline.drain_seconds + seconds)
+    return close_in
+
+
+def tripped_breaker():
+    breaker = CircuitBreaker(window=10, min_samples=1, error_rate=0.5, cooldown=60)
+    breaker.record(SERVER_ERROR)
+    return breaker
+
+
+def test_rate_limit_wait_is_capped():
+    rates = RateScheduler({**RATE_LIMIT_CONFIG, "hosts": {}, "default_rate": 0.5, "burst": 1, "jitter": 0.0})
+    assert rates.acquire(URL, max_wait=0.05)
+
+    started = time.monotonic()
+    assert not rates.acquire(URL, max_wait=0.05)
+    assert time.monotonic() - started < 1
+
+
+def test_breaker_wait_is_capped():
+    breaker = tripped_breaker()
+
+    started = time.monotonic()
+    assert not breaker.wait_until_closed(max_wait=0.05)
+    assert time.monotonic() - started < 1
+    assert CircuitBreaker().wait_until_closed(max_wait=0)
+
+
+def test_fetch_waiting_on_breaker_stops_at_deadline(deadline_in, monkeypatch):
+    page_fetcher = pytest.importorskip("page_fetcher")
+    monkeypatch.setattr(page_fetcher, "circuit_breaker", tripped_breaker())
+    monkeypatch.setattr(page_fetcher, "session_pool", None)  # any request would fail the test
+    deadline_in(0.05)
+
+    started = time.monotonic()
+    assert page_fetcher.try_agent(URL, "agent") == (None, DEADLINE)
+    assert time.monotonic() - started < 1
+
+
+def test_deferral_past_deadline_skips_job(deadline_in):
+    deadline_in(0)
+    shared_state = SharedState()
+    job = VerifyDetailJob("A", URL, shared_state)
+
+    assert job.defer(job_queue=None)
+
+    assert (job.deferrals, shared_state.retry_budget.spent) == (0, 0)
+    assert run_deadline.get_stats() == {"VerifyDetailJob": 1}
+    assert run_deadline.skipped_urls == [URL]
+
+
+def test_retry_after_is_clamped():
+    max_retry_after = FETCH_POLICY_CONFIG["max_retry_after"]
+    in_a_day = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+
+    assert parse_retry_after("86400") == max_retry_after
+    assert parse_retry_after(in_a_day) == max_retry_after
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("soon") is None
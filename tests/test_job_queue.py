@@ -0,0 +1,46 @@
+import time
+from queue import Empty
+
+import pytest
+
+import job
+from config import RATE_LIMIT_CONFIG
+from job import PrioritizedJobQueue, SharedState
+from jobs.verifier import VerifyDetailJob
+from rate_limiter import RateScheduler
+
+URL = "https://www.cars.com/vehicledetail/1/"
+
+
+def test_held_job_waits_for_not_before():
+    job_queue = PrioritizedJobQueue()
+    held = VerifyDetailJob("HELD", URL, SharedState())
+    held.not_before = time.monotonic() + 0.2
+    ready = VerifyDetailJob("READY", URL, SharedState())
+    job_queue.put_job(held, 1)
+    job_queue.put_job(ready, 5)
+
+    assert job_queue.get()[2] is ready
+    with pytest.raises(Empty):
+        job_queue.get(block=False)
+    started = time.monotonic()
+    assert job_queue.get(timeout=5)[2] is held
+    assert 0.1 < time.monotonic() - started < 1
+
+
+def test_fetch_job_far_from_its_slot_is_held_not_slept(monkeypatch):
+    page_fetcher = pytest.importorskip("page_fetcher")
+    rates = RateScheduler({**RATE_LIMIT_CONFIG, "hosts": {}, "default_rate": 0.1, "burst": 1, "jitter": 0.0})
+    rates.acquire(URL)  # the next slot is now 10 seconds off
+    monkeypatch.setattr(job, "rate_scheduler", rates)
+    monkeypatch.setattr(page_fetcher, "fetch_html_with_fallback", lambda *args: pytest.fail("fetched"))
+    job_queue = PrioritizedJobQueue()
+    verify = VerifyDetailJob("A", URL, SharedState())
+
+    started = time.monotonic()
+    verify.run(job_queue)
+
+    assert time.monotonic() - started < 1
+    assert job_queue.qsize() == 1 and verify.not_before > time.monotonic() + 5
+    with pytest.raises(Empty):
+        job_queue.get(block=False)
@@ -0,0 +1,78 @@
+import sqlite3
+
+import db
+
+# The tables and listing upsert as they were before the migrations (and the INSERT column fix)
+BASELINE_SCHEMA = """
+CREATE TABLE listings (
+    vin TEXT PRIMARY KEY, listing_id TEXT, title TEXT, price INTEGER, msrp INTEGER, mileage INTEGER,
+    dealer TEXT, location TEXT, distance INTEGER, shipping_cost REAL, search_scope TEXT, url TEXT,
+    image_url TEXT, days_on_market INTEGER, date_added DATE, first_seen DATE, last_seen DATE,
+    status TEXT DEFAULT 'active'
+);
+CREATE TABLE price_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, vin TEXT, date DATE, price INTEGER,
+    FOREIGN KEY (vin) REFERENCES listings(vin)
+);
+"""
+
+BASELINE_UPSERT = """
+INSERT INTO listings (vin, listing_id, title, price) VALUES (?, ?, ?, ?)
+ON CONFLICT(vin) DO UPDATE SET price = excluded.price, last_seen = CURRENT_DATE
+"""
+
+
+def baseline_save(conn, listing):
+    # The baseline passed (vin, listing_id, price, title) for columns (vin, listing_id, title, price)
+    conn.execute(BASELINE_UPSERT, (listing["vin"], listing["listing_id"], listing["price"], listing.get("title")))
+
+
+def make_baseline_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    # Saved once from a detail scrape
+    baseline_save(conn, {"vin": "A", "listing_id": "1", "price": 30000, "title": "2024 Honda CR-V EX"})
+    # Saved, then re-seen on a results page (ListingIDResolutionJob saves without a title)
+    baseline_save(conn, {"vin": "B", "listing_id": "2", "price": 25000, "title": "2023 Kia Sportage LX"})
+    baseline_save(conn, {"vin": "B", "listing_id": "2", "price": 24500})
+    conn.executemany("INSERT INTO price_history (vin, date, price) VALUES (?, ?, ?)",
+                     [("A", "2026-10-01", 30000), ("A", "2026-10-01", 30000), ("A", "2026-10-02", 29500)])
+    conn.commit()
+    conn.close()
+
+
+def test_migrations_repair_baseline_db(temp_db):
+    make_baseline_db(temp_db)
+
+    db.init_db()
+
+    conn = sqlite3.connect(temp_db)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRATIONS)
+    rows = dict((vin, (title, price)) for vin, title, price in conn.execute("SELECT vin, title, price FROM listings"))
+    assert rows["A"] == ("2024 Honda CR-V EX", 30000)
+    # The title was overwritten by the later upsert and can't be recovered; the price can
+    assert rows["B"] == (None, 25000)
+    assert conn.execute("SELECT date, price FROM price_history WHERE vin = 'A' ORDER BY date").fetchall() == [
+        ("2026-10-01", 30000), ("2026-10-02", 29500)]
+    indexes = {row[1] for row in conn.execute("SELECT * FROM sqlite_master WHERE type = 'index'").fetchall()}
+    assert {"idx_listings_listing_id", "idx_listings_status_last_seen",
+            "idx_price_history_date_vin", "idx_price_history_vin_date"} <= indexes
+    conn.close()
+
+
+def test_migrations_run_once(temp_db):
+    db.init_db()
+    with db.get_db_conn() as conn:
+        assert db.migrate(conn) == len(db.MIGRATIONS)
+
+
+def test_price_logged_once_per_day(temp_db):
+    db.init_db()
+    listing = {"vin": "C", "listing_id": "3", "price": 20000, "title": "2025 Ford Escape"}
+    db.flush_listings_to_db([listing])
+    db.flush_listings_to_db([dict(listing, price=19000)])
+    db.log_price("C", 18000)
+
+    with db.get_db_conn() as conn:
+        assert conn.execute("SELECT price FROM price_history WHERE vin = 'C'").fetchall() == [(20000,)]
+        assert conn.execute("SELECT title, price FROM listings WHERE vin = 'C'").fetchone() == ("2025 Ford Escape", 19000)
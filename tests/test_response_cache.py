@@ -0,0 +1,50 @@
+import os
+import time
+
+from response_cache import ResponseCache
+
+URL = "https://www.cars.com/vehicledetail/1/"
+
+
+def make_cache(tmp_path, **kwargs):
+    return ResponseCache(cache_dir=str(tmp_path), ttl_seconds={"detail": 60}, mode="normal", **kwargs)
+
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_stale_entry_is_deleted_on_read(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    cache.put(URL, "<html></html>", "detail")
+    assert cache.get(URL, "detail") == "<html></html>"
+
+    monkeypatch.setattr(time, "time", lambda: os.path.getmtime(cache._path(URL)) + 120)
+
+    assert cache.get(URL, "detail") is None
+    assert not os.path.exists(cache._path(URL))
+
+
+def test_prune_drops_old_entries_then_oldest_over_size(tmp_path):
+    cache = make_cache(tmp_path, max_age_days=1, max_size_mb=0.01)
+    urls = [f"{URL}?page={page}" for page in range(4)]
+    for seconds, url in zip((3 * 24 * 3600, 300, 200, 100), urls):
+        cache.put(url, os.urandom(4000).hex(), "detail")
+        age(cache._path(url), seconds)
+
+    removed, freed = cache.prune()
+
+    remaining = [url for url in urls if os.path.exists(cache._path(url))]
+    assert remaining == urls[-len(remaining):] and 1 <= len(remaining) < 3
+    assert removed == len(urls) - len(remaining) and freed > 0
+    assert sum(os.path.getsize(cache._path(url)) for url in remaining) <= cache.max_size_bytes
+
+
+def test_replay_cache_is_not_pruned(tmp_path):
+    cache = make_cache(tmp_path, max_age_days=0)
+    cache.put(URL, "<html></html>", "detail")
+    cache.mode = "replay"
+
+    assert cache.prune() == (0, 0)
+    assert cache.get(URL, "detail") == "<html></html>"
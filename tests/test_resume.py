@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from job import PrioritizedJobQueue, SharedState
+from job_store import job_store
+from jobs.card_processing import DetailScrapeJob
+from jobs.verifier import VerifyDetailJob
+from utils.card_record import CardRecord
+
+main = pytest.importorskip("main")
+
+URL = "https://www.cars.com/vehicledetail/1/"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_store, "path", str(tmp_path / "job_store.db"))
+    job_store.enable()
+    yield job_store
+    job_store.close()
+
+
+def queued_types(job_queue):
+    types = []
+    while not job_queue.empty():
+        types.append(job_queue.get()[2].__class__.__name__)
+    return types
+
+
+def test_resume_leaves_verification_to_the_new_verifier(store):
+    shared_state = SharedState()
+    store.record(VerifyDetailJob("A", URL, shared_state), 3)
+    store.record(DetailScrapeJob("2", CardRecord(listing_id="2", detail_path="/vehicledetail/2/"), shared_state), 4)
+    # Written by a store from before VerifyDetailJobs stopped being recorded
+    store._execute("INSERT INTO jobs (run_date, job_type, args, priority, status) VALUES (date('now'), ?, ?, 3, ?)",
+                   ("VerifyDetailJob", json.dumps({"vin": "B", "url": URL}), "pending"))
+
+    job_queue = PrioritizedJobQueue()
+    main.resume_jobs(job_queue, shared_state)
+
+    assert sorted(queued_types(job_queue)) == ["DetailScrapeJob", "VerifierJob"]
@@ -0,0 +1,49 @@
+import json
+from argparse import Namespace
+
+import pytest
+
+import db
+from job import SharedState
+from run_deadline import RunDeadline
+from utils.card_record import CardRecord
+
+main = pytest.importorskip("main")
+
+
+class Tracker:
+    pools = None
+
+    def record_start(self, job_type):
+        pass
+
+    def record_complete(self, job_type):
+        pass
+
+
+def test_report_without_deadline(tmp_path):
+    deadline = RunDeadline({"drain_minutes": 5, "report_dir": str(tmp_path)})
+    deadline.start(None)
+    deadline.skip_backlog("VerifyDetailJob", 3)
+
+    with open(deadline.write_report(), encoding="utf-8") as f:
+        report = json.load(f)
+
+    assert (report["deadline"], report["skipped"]) == (None, {"VerifyDetailJob": 3})
+
+
+def test_leftover_unresolved_listings_are_resolved(temp_db):
+    db.init_db()
+    db.flush_listings_to_db([{"vin": "A", "listing_id": "1", "price": 30000, "title": "2024 Honda CR-V EX"}])
+    shared_state = SharedState(batch_size=100)
+    shared_state.tracker = Tracker()
+
+    def seed(job_queue, state):
+        # Buffered with nothing left to flush it, as after the dispatcher's final flush
+        state.unresolved_buffer.add("1", CardRecord(listing_id="1", price=28000, search_scope="local"))
+
+    main.run_pipeline(Namespace(engine="threads"), shared_state, seed)
+
+    assert not shared_state.unresolved_buffer.buffer
+    with db.get_db_conn() as conn:
+        assert conn.execute("SELECT price, search_scope FROM listings WHERE vin = 'A'").fetchone() == (28000, "local")
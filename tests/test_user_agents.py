@@ -0,0 +1,40 @@
+from user_agent_tracking import UserAgentRegistry
+
+
+def make_registry(tmp_path, failed=()):
+    (tmp_path / "failed.log").write_text("".join(f"{ua}\n" for ua in failed), encoding="utf-8")
+    return UserAgentRegistry(str(tmp_path / "successful.log"), str(tmp_path / "failed.log"),
+                             str(tmp_path / "valid.txt"), window=10, min_success_rate=0.2)
+
+
+def test_one_failure_keeps_agent_in_rotation(tmp_path):
+    registry = make_registry(tmp_path, failed=["logged-failure"])
+    registry.record("good", success=True)
+    registry.record("unlucky", success=True)
+    registry.record("unlucky", success=False)
+
+    assert sorted(registry.choose(5)) == ["good", "logged-failure", "unlucky"]
+    assert not registry.is_failed("unlucky")
+
+
+def test_agent_below_min_rate_leaves_rotation(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.record("good", success=True)
+    for _ in range(5):
+        registry.record("bad", success=False)
+
+    assert registry.choose(5) == ["good"]
+    assert registry.is_failed("bad")
+    assert registry.valid_agents() == ["good"]
+
+
+def test_choice_favours_recent_success(tmp_path):
+    registry = make_registry(tmp_path)
+    for i in range(10):
+        registry.record("reliable", success=True)
+        registry.record("flaky", success=i < 4)
+
+    firsts = [registry.choose(1)[0] for _ in range(1000)]
+
+    # Weights 11/12 and 5/12: both stay in rotation, the reliable agent is picked first about 2/3 of the time
+    assert firsts.count("reliable") > firsts.count("flaky") > 0
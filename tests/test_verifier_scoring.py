@@ -0,0 +1,63 @@
+from dataclasses import asdict
+from datetime import date
+
+import db
+from jobs.card_processing import listing_from_card
+from jobs.page_loader import PageLoadJob
+from utils.card_record import CardRecord
+
+
+def save(vin, listing_id, scope, price=25000, title="2024 Honda CR-V EX"):
+    db.flush_listings_to_db([{"vin": vin, "listing_id": listing_id, "price": price, "title": title,
+                              "search_scope": scope, "url": f"/vehicledetail/{listing_id}/"}])
+
+
+def set_last_seen(last_seen):
+    with db.get_db_conn() as conn:
+        conn.execute("UPDATE listings SET last_seen = ?", (last_seen,))
+        conn.commit()
+
+
+def test_local_listing_outranks_identical_national_one(temp_db):
+    db.init_db()
+    save("NATIONAL", "1", "national")
+    save("LOCAL", "2", "local")
+    set_last_seen("2026-10-10")
+
+    ranked = [vin for vin, _, _ in db.get_verification_candidates(today=date(2026, 10, 17))]
+
+    assert ranked == ["LOCAL", "NATIONAL"]
+
+
+def test_local_scope_is_kept_when_seen_nationally(temp_db):
+    db.init_db()
+    save("A", "1", "local")
+    save("A", "1", "national")
+    save("B", "2", "national")
+    save("B", "2", "local")
+
+    with db.get_db_conn() as conn:
+        scopes = dict(conn.execute("SELECT vin, search_scope FROM listings").fetchall())
+    assert scopes == {"A": "local", "B": "local"}
+
+
+def test_cheaper_than_segment_ranks_first(temp_db):
+    db.init_db()
+    save("PRICEY", "1", "national", price=30000)
+    save("CHEAP", "2", "national", price=20000)
+    set_last_seen("2026-10-10")
+
+    ranked = [vin for vin, _, _ in db.get_verification_candidates(today=date(2026, 10, 17))]
+
+    assert ranked == ["CHEAP", "PRICEY"]
+
+
+def test_page_scope_reaches_listing():
+    page = PageLoadJob(page_num=1, makes=["honda"], models=["honda-cr_v"], scope="local", zip_code="60601",
+                       radius=50, shared_state=None)
+    fields = {"cards": [asdict(CardRecord(listing_id="1", detail_path="/vehicledetail/1/"))]}
+
+    card = page.card_records(fields)[0]
+
+    assert card.search_scope == "local"
+    assert listing_from_card("1", card)["search_scope"] == "local"
@@ -1,4 +1,12 @@
+import atexit
 import os
+import random
+import tempfile
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import UA_REGISTRY_CONFIG
 
 VALID_UA_LOG = "valid_user_agents.txt"
 SUCCESS_UA_LOG = "successful_user_agents.log"
@@ -13,47 +21,185 @@ def read_user_agent_set(file_path):
 
 
 def write_user_agent_set(file_path, ua_set):
-    with open(file_path, "w", encoding="utf-8") as f:
-        for ua in sorted(ua_set):
-            f.write(ua + "\n")
-
-
-def update_valid_user_agents(success_set=None, failed_set=None):
-    if success_set is None:
-        success_set = read_user_agent_set(SUCCESS_UA_LOG)
-    if failed_set is None:
-        failed_set = read_user_agent_set(FAILED_UA_LOG)
-
-    valid_set = success_set - failed_set
-    if valid_set:
-        write_user_agent_set(VALID_UA_LOG, valid_set)
-    else:
-        print("[WARNING] Skipping write to valid_user_agents.txt (would be empty)")
-
-
-def log_user_agent(ua_string, success=True):
-    ua_string = ua_string.strip()
-    success_set = read_user_agent_set(SUCCESS_UA_LOG)
-    failed_set = read_user_agent_set(FAILED_UA_LOG)
-
-    # Only update sets if there's a change
-    changed = False
-    if success:
-        if ua_string not in success_set:
-            success_set.add(ua_string)
-            failed_set.discard(ua_string)
-            write_user_agent_set(SUCCESS_UA_LOG, success_set)
-            changed = True
-    else:
-        if ua_string not in failed_set:
-            failed_set.add(ua_string)
-            success_set.discard(ua_string)
-            write_user_agent_set(FAILED_UA_LOG, failed_set)
-            changed = True
-
-    if changed:
-        update_valid_user_agents(success_set, failed_set)
+    """
+    Writes the set to a temp file next to file_path and swaps it in, so readers never see a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".ua_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for ua in sorted(ua_set):
+                f.write(ua + "\n")
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class AgentStats:
+    """
+    Success/failure counts, latency, and a window of recent outcomes for one user agent.
+    """
+    __slots__ = ("successes", "failures", "total_latency", "timed_requests", "recent", "last_success")
+
+    def __init__(self, window: int, last_success: bool):
+        self.successes = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.timed_requests = 0
+        self.recent = deque(maxlen=window)
+        self.last_success = last_success
+
+    def weight(self) -> float:
+        # Laplace-smoothed recent success rate, so untested agents still get picked occasionally
+        return (sum(self.recent) + 1) / (len(self.recent) + 2)
+
+    def avg_latency(self) -> Optional[float]:
+        return self.total_latency / self.timed_requests if self.timed_requests else None
+
+
+class UserAgentRegistry:
+    """
+    Thread-safe in-memory record of user agent health. Loaded from the log files at startup and
+    snapshotted back to them periodically and on shutdown; the files keep their original format
+    (an agent is "successful" or "failed" by its latest outcome, and valid = successful - failed).
+    """
+    def __init__(self, success_path: str = SUCCESS_UA_LOG, failed_path: str = FAILED_UA_LOG,
+                 valid_path: str = VALID_UA_LOG, window: int = UA_REGISTRY_CONFIG["recent_window"],
+                 min_success_rate: float = UA_REGISTRY_CONFIG["min_success_rate"]):
+        self.success_path = success_path
+        self.failed_path = failed_path
+        self.valid_path = valid_path
+        self.window = window
+        self.min_success_rate = min_success_rate
+        self.agents: Dict[str, AgentStats] = {}
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.dirty = False
+        self.stop_event = threading.Event()
+        self.autosave_thread = None
+        self.load()
+
+    def load(self) -> None:
+        success_set = read_user_agent_set(self.success_path)
+        failed_set = read_user_agent_set(self.failed_path)
+        valid_set = read_user_agent_set(self.valid_path)
+        with self.lock:
+            self.agents = {}
+            for ua in failed_set:
+                # Starts below untested agents, but one logged failure doesn't take it out of rotation
+                stats = self.agents[ua] = AgentStats(self.window, last_success=False)
+                stats.recent.append(0)
+            for ua in (success_set | valid_set) - failed_set:
+                self.agents[ua] = AgentStats(self.window, last_success=True)
+            self.dirty = False
+
+    def record(self, ua: str, success: bool, latency: Optional[float] = None) -> None:
+        ua = ua.strip()
+        with self.lock:
+            stats = self.agents.get(ua)
+            if stats is None:
+                stats = self.agents[ua] = AgentStats(self.window, last_success=success)
+                self.dirty = True
+            if success:
+                stats.successes += 1
+            else:
+                stats.failures += 1
+            if latency is not None:
+                stats.total_latency += latency
+                stats.timed_requests += 1
+            stats.recent.append(1 if success else 0)
+            if stats.last_success != success:
+                stats.last_success = success
+                self.dirty = True
+
+    def valid_agents(self) -> List[str]:
+        with self.lock:
+            return [ua for ua, stats in self.agents.items() if stats.weight() >= self.min_success_rate]
+
+    def is_failed(self, ua: str) -> bool:
+        with self.lock:
+            stats = self.agents.get(ua)
+            return stats is not None and stats.weight() < self.min_success_rate
+
+    def choose(self, k: int) -> List[str]:
+        """
+        Weighted sample of up to k agents without replacement, by recent success rate. Agents below
+        min_success_rate are left out; last_success only decides which log file an agent is written to.
+        """
+        with self.lock:
+            candidates = [(ua, stats.weight()) for ua, stats in self.agents.items()]
+        keyed = [(random.random() ** (1.0 / weight), ua) for ua, weight in candidates
+                 if weight >= self.min_success_rate]
+        keyed.sort(reverse=True)
+        return [ua for _, ua in keyed[:k]]
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {
+                ua: {
+                    "successes": stats.successes,
+                    "failures": stats.failures,
+                    "avg_latency": stats.avg_latency(),
+                    "recent_success_rate": stats.weight(),
+                }
+                for ua, stats in self.agents.items()
+                if stats.successes or stats.failures
+            }
+
+    def snapshot(self, force: bool = False) -> None:
+        """
+        Persists the registry to the log files if anything changed since the last snapshot.
+        """
+        with self.write_lock:
+            with self.lock:
+                if not (self.dirty or force):
+                    return
+                success_set = {ua for ua, stats in self.agents.items() if stats.last_success}
+                failed_set = {ua for ua, stats in self.agents.items() if not stats.last_success}
+                self.dirty = False
+
+            write_user_agent_set(self.success_path, success_set)
+            write_user_agent_set(self.failed_path, failed_set)
+            if success_set:
+                write_user_agent_set(self.valid_path, success_set)
+            else:
+                print("[WARNING] Skipping write to valid_user_agents.txt (would be empty)")
+
+    def start_autosave(self, interval: float = UA_REGISTRY_CONFIG["snapshot_interval"]) -> None:
+        if self.autosave_thread is not None:
+            return
+        self.stop_event.clear()
+        self.autosave_thread = threading.Thread(target=self._autosave_loop, args=(interval,), daemon=True)
+        self.autosave_thread.start()
+
+    def _autosave_loop(self, interval: float) -> None:
+        while not self.stop_event.wait(interval):
+            try:
+                self.snapshot()
+            except OSError as e:
+                print(f"[UserAgentRegistry] Snapshot failed: {e}")
+
+    def shutdown(self) -> None:
+        self.stop_event.set()
+        if self.autosave_thread is not None:
+            self.autosave_thread.join()
+            self.autosave_thread = None
+        self.snapshot()
+
+
+ua_registry = UserAgentRegistry()
+atexit.register(ua_registry.snapshot)
+
+
+def log_user_agent(ua_string, success=True, latency=None):
+    ua_registry.record(ua_string, success=success, latency=latency)
 
 
 def get_valid_user_agents():
-    return list(read_user_agent_set(VALID_UA_LOG))
+    return ua_registry.valid_agents()
+
+
+def choose_user_agents(k):
+    return ua_registry.choose(k)
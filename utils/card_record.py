@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from typing import Optional
+
+DETAIL_BASE_URL = "https://www.cars.com"
+
+
+@dataclass(slots=True)
+class CardRecord:
+    """
+    Fields pulled from one search-results card. Extracted once at page-load time so the
+    results-page tree can be released instead of travelling with every queued job.
+    """
+    listing_id: str
+    detail_path: Optional[str] = None
+    title: Optional[str] = None
+    price: Optional[int] = None
+    msrp: Optional[int] = None
+    dealer: Optional[str] = None
+    location: Optional[str] = None
+    image_url: Optional[str] = None
+    search_scope: Optional[str] = None  # "local" or "national": the search whose page the card was on
+
+    @property
+    def detail_url(self) -> str:
+        return f"{DETAIL_BASE_URL}{self.detail_path}"
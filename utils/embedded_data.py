@@ -0,0 +1,189 @@
+import json
+import re
+from collections import deque
+from typing import Any, Dict, Optional
+
+from utils.html_parser import get_parser
+
+# Structured listing data cars.com embeds alongside the rendered markup
+LD_JSON_SELECTOR = 'script[type="application/ld+json"]'
+DATA_ATTRIBUTES = ["data-vehicle-details", "data-override-payload"]
+VEHICLE_TYPES = {"car", "vehicle", "product"}
+# Fields that tell which listing a data-attribute node describes
+LISTING_IDENTITY = ("vin", "listing_id")
+
+# Listing field -> candidate JSON keys (lowercased), in order of preference
+FIELD_KEYS = {
+    "listing_id": ("listingid", "listing_id"),
+    "vin": ("vin", "vehicleidentificationnumber"),
+    "mileage": ("mileage", "mileagefromodometer", "odometer"),
+    "price": ("price", "listingprice", "customerprice"),
+    "msrp": ("msrp",),
+    "days_on_market": ("daysonmarket", "days_on_market"),
+    "title": ("title", "name"),
+    "dealer": ("dealername", "sellername", "dealer", "seller"),
+}
+
+NUMBER_PATTERN = re.compile(r"\d[\d,]*")
+
+
+def _load_json(text: Optional[str]) -> Any:
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _flatten(obj: Any) -> Dict[str, Any]:
+    """
+    Collects every key in a JSON document into one lowercased dict, breadth first,
+    so top-level values win over nested ones with the same name.
+    """
+    flat = {}
+    pending = deque([obj])
+    while pending:
+        item = pending.popleft()
+        if isinstance(item, list):
+            pending.extend(item)
+        elif isinstance(item, dict):
+            for key, value in item.items():
+                flat.setdefault(key.lower(), value)
+                if isinstance(value, (dict, list)):
+                    pending.append(value)
+    return flat
+
+
+def _is_vehicle(obj: Dict) -> bool:
+    types = obj.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return any(isinstance(t, str) and t.lower() in VEHICLE_TYPES for t in types)
+
+
+def _find_vehicle(obj: Any) -> Optional[Dict]:
+    if isinstance(obj, list):
+        return next(filter(None, map(_find_vehicle, obj)), None)
+    if isinstance(obj, dict):
+        if _is_vehicle(obj):
+            return obj
+        return _find_vehicle(obj.get("@graph"))
+    return None
+
+
+def to_int(value: Any) -> Optional[int]:
+    """
+    Coerces embedded numbers like 41995, "41995.00", "$41,995" or {"value": 12} to an int.
+    """
+    if isinstance(value, dict):
+        value = value.get("value")
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = NUMBER_PATTERN.search(str(value))
+    return int(match.group(0).replace(",", "")) if match else None
+
+
+def to_text(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        value = value.get("name")
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+FIELD_TYPES = {
+    "listing_id": to_text,
+    "vin": to_text,
+    "mileage": to_int,
+    "price": to_int,
+    "msrp": to_int,
+    "days_on_market": to_int,
+    "title": to_text,
+    "dealer": to_text,
+}
+
+
+def _listing_fields(flat: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {}
+    for field, keys in FIELD_KEYS.items():
+        for key in keys:
+            value = FIELD_TYPES[field](flat.get(key))
+            if value is not None:
+                fields[field] = value
+                break
+    return fields
+
+
+def _attribute_json(node) -> Dict[str, Any]:
+    parser = get_parser()
+    flat = {}
+    for name in DATA_ATTRIBUTES:
+        data = _load_json(parser.attr(node, name))
+        if data is not None:
+            for key, value in _flatten(data).items():
+                flat.setdefault(key, value)
+    return flat
+
+
+def _main_listing_fields(soup, vehicle: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reads the data attributes of the node describing the page's own listing. Similar-vehicle cards
+    are skipped, as is any node whose VIN or listing ID contradicts the schema.org vehicle.
+    """
+    parser = get_parser()
+    card_nodes = parser.select(soup, ", ".join(f"div.vehicle-card[{name}], div.vehicle-card [{name}]"
+                                               for name in DATA_ATTRIBUTES))
+    selector = ", ".join(f"[{name}]" for name in DATA_ATTRIBUTES)
+    for node in parser.select(soup, selector):
+        if any(node is card_node for card_node in card_nodes):
+            continue
+        fields = _listing_fields(_attribute_json(node))
+        if any(fields.get(name) not in (None, vehicle.get(name)) for name in LISTING_IDENTITY if name in vehicle):
+            continue
+        return fields
+    return {}
+
+
+def extract_embedded_listing(soup) -> Dict[str, Any]:
+    """
+    Reads listing fields from a detail page's schema.org vehicle JSON, then from the listing's own
+    data attributes for whatever the JSON lacks. Each source is resolved on its own, so a key in one
+    never shadows a preferred key in another. Returns only the fields that were present.
+    """
+    parser = get_parser()
+    vehicle = {}
+    for script in parser.select(soup, LD_JSON_SELECTOR):
+        found = _find_vehicle(_load_json(parser.text(script)))
+        if found is not None:
+            vehicle = _listing_fields(_flatten(found))
+            break
+
+    fields = _main_listing_fields(soup, vehicle)
+    fields.update(vehicle)
+    return fields
+
+
+def extract_embedded_card(card) -> Dict[str, Any]:
+    """
+    Reads listing fields from the JSON data attributes on a results-page card or its children.
+    """
+    parser = get_parser()
+    flat = _attribute_json(card)
+    if not flat:
+        selector = ", ".join(f"[{name}]" for name in DATA_ATTRIBUTES)
+        node = parser.select_one(card, selector)
+        if node is not None:
+            flat = _attribute_json(node)
+    return _listing_fields(flat)
+
+
+def extraction_path(found: int, wanted: int) -> str:
+    """
+    Labels how a page's fields were obtained: all from embedded JSON, none, or a mix.
+    """
+    if found == 0:
+        return "dom"
+    return "json" if found >= wanted else "mixed"
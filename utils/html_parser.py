@@ -0,0 +1,157 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from config import HTML_PARSER
+
+
+class ParserBackend(ABC):
+    """
+    Minimal document API the scrapers need: parse HTML, run CSS selectors, read text and attributes.
+    soup_helpers and the jobs only talk to this interface, so the backend can be swapped at startup.
+    """
+    name = "base"
+
+    @abstractmethod
+    def parse(self, html: str):
+        pass
+
+    @abstractmethod
+    def select(self, node, css: str) -> List:
+        pass
+
+    @abstractmethod
+    def select_one(self, node, css: str):
+        pass
+
+    @abstractmethod
+    def text(self, node) -> str:
+        pass
+
+    @abstractmethod
+    def attr(self, node, name: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def definitions(self, node) -> Dict[str, str]:
+        """
+        Maps each lowercased <dt> label under node to the text of its following <dd>.
+        """
+        pass
+
+
+class SoupBackend(ParserBackend):
+    """
+    BeautifulSoup with either the pure-Python "html.parser" or the lxml tree builder.
+    """
+    def __init__(self, builder: str = "html.parser"):
+        self.builder = builder
+        self.name = "html.parser" if builder == "html.parser" else f"bs4-{builder}"
+
+    def parse(self, html: str):
+        return BeautifulSoup(html, self.builder)
+
+    def select(self, node, css: str) -> List:
+        return node.select(css)
+
+    def select_one(self, node, css: str):
+        return node.select_one(css)
+
+    def text(self, node) -> str:
+        return node.text.strip()
+
+    def attr(self, node, name: str) -> Optional[str]:
+        return node.get(name)
+
+    def definitions(self, node) -> Dict[str, str]:
+        result = {}
+        for dt in node.find_all("dt"):
+            dd = dt.find_next_sibling("dd")
+            result[dt.text.strip().lower()] = dd.text.strip() if dd else None
+        return result
+
+
+@lru_cache(maxsize=256)
+def _compile_css(css: str):
+    from lxml.cssselect import CSSSelector
+    return CSSSelector(css)
+
+
+class LxmlBackend(ParserBackend):
+    """
+    Native lxml.html tree with cached, compiled cssselect selectors. Several times faster than bs4.
+    """
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        self.html_module = lxml.html
+        self.parser = lxml.html.HTMLParser(encoding="utf-8")
+
+    def parse(self, html: str):
+        if not html.strip():
+            html = "<html></html>"
+        return self.html_module.fromstring(html.encode("utf-8"), parser=self.parser)
+
+    def select(self, node, css: str) -> List:
+        return _compile_css(css)(node)
+
+    def select_one(self, node, css: str):
+        matches = _compile_css(css)(node)
+        return matches[0] if matches else None
+
+    def text(self, node) -> str:
+        return node.text_content().strip()
+
+    def attr(self, node, name: str) -> Optional[str]:
+        return node.get(name)
+
+    def definitions(self, node) -> Dict[str, str]:
+        result = {}
+        for dt in node.iter("dt"):
+            dd = dt.getnext()
+            while dd is not None and dd.tag != "dd":
+                dd = dd.getnext()
+            result[dt.text_content().strip().lower()] = dd.text_content().strip() if dd is not None else None
+        return result
+
+
+def lxml_available() -> bool:
+    try:
+        import lxml.html  # noqa: F401
+        import lxml.cssselect  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_parser(name: str) -> ParserBackend:
+    if name == "auto":
+        name = "lxml" if lxml_available() else "html.parser"
+    if name == "lxml":
+        return LxmlBackend()
+    if name == "bs4-lxml":
+        return SoupBackend("lxml")
+    if name == "html.parser":
+        return SoupBackend("html.parser")
+    raise ValueError(f"Unknown HTML parser backend: {name}")
+
+
+_parser: Optional[ParserBackend] = None
+
+
+def configure_parser(name: str = HTML_PARSER) -> ParserBackend:
+    """
+    Selects the process-wide parser backend. Called once at startup by main.
+    """
+    global _parser
+    _parser = create_parser(name)
+    return _parser
+
+
+def get_parser() -> ParserBackend:
+    if _parser is None:
+        return configure_parser()
+    return _parser
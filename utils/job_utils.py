@@ -1,7 +1,13 @@
+from typing import Optional
 from config import JOB_PRIORITIES
+from backpressure import backpressure
+from job_store import job_store
 
 
-def enqueue_with_priority(job_queue, job):
+def enqueue_with_priority(job_queue, job, priority: Optional[int] = None):
     job_type = job.__class__.__name__
-    priority = JOB_PRIORITIES.get(job_type, 10)
+    if priority is None:
+        priority = JOB_PRIORITIES.get(job_type, 10) + getattr(job, "priority_offset", 0)
+    backpressure.job_enqueued(job_type)
+    job_store.record(job, priority)
     job_queue.put_job(job, priority)
@@ -1,13 +1,163 @@
+import re
+from dataclasses import asdict
+
+from utils.card_record import CardRecord
+from utils.embedded_data import extract_embedded_card, extract_embedded_listing, extraction_path
+from utils.html_parser import get_parser
+
+TOTAL_RESULTS_SELECTORS = ["span.total-filter-count", ".sds-page-section__title", "h1"]
+TOTAL_RESULTS_PATTERN = re.compile(r"([\d,]+)\s+(?:matches|results)", re.IGNORECASE)
+
+
+def select_text(node, selector: str) -> str | None:
+    """
+    Returns the stripped text of the first element matching selector, if any.
+    """
+    parser = get_parser()
+    el = parser.select_one(node, selector)
+    return parser.text(el) if el is not None else None
+
+
+def select_attr(node, selector: str, attr: str) -> str | None:
+    """
+    Returns an attribute of the first element matching selector, if any.
+    """
+    parser = get_parser()
+    el = parser.select_one(node, selector)
+    return parser.attr(el, attr) if el is not None else None
+
+
 def check_listing_still_active(soup) -> bool:
     """
     Returns True if the listing is still active.
     """
-    return soup.select_one("spark-notification.unlisted-notification[open]") is None
+    return get_parser().select_one(soup, "spark-notification.unlisted-notification[open]") is None
 
 
 def extract_price(soup) -> int | None:
     """
     Extracts the price from the soup, if present.
     """
-    el = soup.select_one("span.primary-price")
-    return int(el.text.strip().replace("$", "").replace(",", "")) if el and "$" in el.text else None
+    text = select_text(soup, "span.primary-price")
+    return int(text.replace("$", "").replace(",", "")) if text and "$" in text else None
+
+
+def extract_msrp(soup) -> int | None:
+    """
+    Extracts the MSRP shown as a secondary price, if present.
+    """
+    text = select_text(soup, "span.secondary-price")
+    if text and "MSRP" in text:
+        return int(text.replace("MSRP", "").replace("$", "").replace(",", "").strip())
+    return None
+
+
+def extract_vin_and_mileage(soup) -> tuple[str | None, int | None]:
+    """
+    Reads VIN and mileage from the detail page's <dt>/<dd> specs list.
+    """
+    specs = get_parser().definitions(soup)
+    vin = specs.get("vin")
+    mileage = None
+    raw_mileage = specs.get("mileage")
+    if raw_mileage:
+        m = raw_mileage.replace(" mi.", "").replace(",", "")
+        mileage = int(m) if m.isdigit() else None
+    return vin, mileage
+
+
+def extract_days_on_market(soup) -> int | None:
+    text = select_text(soup, "div.price-history-summary div.listed-time strong")
+    return int(text) if text and text.isdigit() else None
+
+
+def extract_total_results(soup) -> int | None:
+    """
+    Extracts the total number of matching listings from a results page, if shown.
+    """
+    for selector in TOTAL_RESULTS_SELECTORS:
+        text = select_text(soup, selector)
+        if text is None:
+            continue
+        match = TOTAL_RESULTS_PATTERN.search(text)
+        if match:
+            return int(match.group(1).replace(",", ""))
+    return None
+
+
+CARD_JSON_FIELDS = ("title", "price", "msrp", "dealer")
+DETAIL_JSON_FIELDS = ("vin", "mileage", "days_on_market", "price", "msrp")
+
+
+def extract_card_record(card) -> tuple[CardRecord | None, str]:
+    """
+    Extracts the fields the pipeline needs from a results-page vehicle card, preferring the card's
+    embedded JSON and falling back to CSS selectors per missing field. Also returns the path used.
+    """
+    parser = get_parser()
+    embedded = extract_embedded_card(card)
+    listing_id = parser.attr(card, "data-listing-id") or embedded.get("listing_id")
+    if not listing_id:
+        return None, "dom"
+
+    def field(name, fallback):
+        return embedded[name] if name in embedded else fallback(card)
+
+    record = CardRecord(
+        listing_id=listing_id,
+        detail_path=select_attr(card, "a.image-gallery-link", "href"),
+        title=field("title", lambda c: select_text(c, "h2.title")),
+        price=field("price", extract_price),
+        msrp=field("msrp", extract_msrp),
+        dealer=field("dealer", lambda c: select_text(c, "div.dealer-name strong")),
+        location=select_text(card, "div.miles-from"),
+        image_url=select_attr(card, "img.vehicle-image", "src"),
+    )
+    found = sum(name in embedded for name in CARD_JSON_FIELDS)
+    return record, extraction_path(found, len(CARD_JSON_FIELDS))
+
+
+def parse_results_page(html: str) -> dict:
+    """
+    Parses a results page into plain, picklable data: card fields plus what pagination needs.
+    """
+    parser = get_parser()
+    soup = parser.parse(html)
+    cards = parser.select(soup, "div.vehicle-card")
+    records, paths = [], set()
+    for card in cards:
+        record, path = extract_card_record(card)
+        if record is not None:
+            records.append(asdict(record))
+            paths.add(path)
+    return {
+        "cards": records,
+        "card_count": len(cards),
+        "total_results": extract_total_results(soup),
+        "extraction": paths.pop() if len(paths) == 1 else ("mixed" if paths else "dom"),
+    }
+
+
+def parse_detail_page(html: str) -> dict:
+    """
+    Parses a detail page into plain, picklable listing fields. Embedded vehicle JSON is read first;
+    the DOM is only walked for fields it did not provide.
+    """
+    soup = get_parser().parse(html)
+    fields = {name: value for name, value in extract_embedded_listing(soup).items() if name in DETAIL_JSON_FIELDS}
+    found = len(fields)
+
+    if "vin" not in fields or "mileage" not in fields:
+        vin, mileage = extract_vin_and_mileage(soup)
+        fields.setdefault("vin", vin)
+        fields.setdefault("mileage", mileage)
+    if "days_on_market" not in fields:
+        fields["days_on_market"] = extract_days_on_market(soup)
+    if "price" not in fields:
+        fields["price"] = extract_price(soup)
+    if "msrp" not in fields:
+        fields["msrp"] = extract_msrp(soup)
+
+    fields["active"] = check_listing_still_active(soup)
+    fields["extraction"] = extraction_path(found, len(DETAIL_JSON_FIELDS))
+    return fields
@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, List
+
+from config import WORKER_POOLS, JOB_POOLS
+from job import PrioritizedJobQueue, Worker, StopJob
+
+
+def pool_for(job) -> str:
+    return JOB_POOLS.get(job.__class__.__name__, "fetch")
+
+
+class PoolQueue(PrioritizedJobQueue):
+    """
+    One named pool's queue. Tracks how many of its workers are busy and reports every
+    finished job to the owning WorkerPools so join() covers all pools.
+    """
+    def __init__(self, name: str, size: int, pools: 'WorkerPools'):
+        super().__init__()
+        self.name = name
+        self.size = size
+        self.pools = pools
+        self.busy = 0
+        self.busy_lock = threading.Lock()
+
+    def put_job(self, job, priority: int):
+        self.pools.task_added()
+        super().put_job(job, priority)
+
+    def get(self, block=True, timeout=None):
+        item = super().get(block, timeout)
+        with self.busy_lock:
+            self.busy += 1
+        return item
+
+    def task_done(self):
+        with self.busy_lock:
+            self.busy -= 1
+        super().task_done()
+        self.pools.task_finished()
+
+
+class WorkerPools:
+    """
+    Named, bounded worker pools (fetch, parse, db_write, db_read), each with its own priority queue.
+    Jobs are routed by class through JOB_POOLS, so slow fetches cannot starve DB work and SQLite
+    writes are not issued 32-wide. Exposes put_job/join like PrioritizedJobQueue.
+    """
+    def __init__(self, sizes: Dict[str, int] = WORKER_POOLS):
+        self.queues = {name: PoolQueue(name, size, self) for name, size in sizes.items()}
+        self.workers: List[Worker] = []
+        self.unfinished = 0
+        self.all_done = threading.Condition()
+
+    def put_job(self, job, priority: int):
+        self.queues[pool_for(job)].put_job(job, priority)
+
+    def task_added(self) -> None:
+        with self.all_done:
+            self.unfinished += 1
+
+    def task_finished(self) -> None:
+        with self.all_done:
+            self.unfinished -= 1
+            if self.unfinished <= 0:
+                self.all_done.notify_all()
+
+    def join(self) -> None:
+        """
+        Blocks until every job on every pool, including jobs they enqueue, has finished.
+        """
+        with self.all_done:
+            while self.unfinished > 0:
+                self.all_done.wait()
+
+    def start(self) -> None:
+        for queue in self.queues.values():
+            for _ in range(queue.size):
+                worker = Worker(self, inbox=queue)
+                worker.start()
+                self.workers.append(worker)
+
+    def stop(self) -> None:
+        for queue in self.queues.values():
+            for _ in range(queue.size):
+                queue.put_job(StopJob(), 0)
+        for worker in self.workers:
+            worker.join()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        stats = {}
+        for name, queue in self.queues.items():
+            with queue.busy_lock:
+                busy = queue.busy
+            stats[name] = {
+                "size": queue.size,
+                "busy": busy,
+                "depth": queue.qsize(),
+                "utilization": busy / queue.size if queue.size else 0.0,
+            }
+        return stats